@@ -0,0 +1,21 @@
+import pytest
+
+pytest.importorskip("edge_tts")
+pytest.importorskip("loguru")
+
+from utils.voice import _chunk_text
+
+SAMPLE = "Le prix est de 3,5 euros. Visitez www.site.com maintenant!"
+
+
+def test_chunk_text_short_text_is_unchanged():
+    assert _chunk_text(SAMPLE, 400) == [SAMPLE]
+
+
+def test_chunk_text_long_text_round_trips():
+    text = " ".join([SAMPLE] * 30)
+    chunks = _chunk_text(text, 400)
+    assert len(chunks) > 1
+    assert "".join(chunks) == text
+    assert sum(chunk.count("3,5") for chunk in chunks) == 30
+    assert sum(chunk.count("www.site.com") for chunk in chunks) == 30
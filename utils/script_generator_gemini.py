@@ -1,10 +1,18 @@
 import json
 import logging
+import os
+import sys
 from pathlib import Path
 from typing import Dict, Any
 from .google_api import generate_text # Import from the local google_api module
 from .config_loader import get_config
 import re
+import string
+
+try:
+    import orjson as _json_fast # Optionnel : décodage/encodage JSON plus rapide
+except ImportError:
+    _json_fast = None
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -121,7 +129,32 @@ Si tu ne respectes pas ces durées, la réponse sera rejetée. Chaque scène doi
 - **VALIDITÉ JSON :** Le format de sortie doit être un JSON parfaitement valide, sans texte additionnel avant ou après.
 """
 
+# Le template est découpé une seule fois à l'import en (texte littéral, nom de champ) :
+# chaque rendu n'est plus qu'un "".join, sans ré-analyser les accolades comme str.format.
+_PROMPT_PARTS = [(literal, field_name) for literal, field_name, _, _ in string.Formatter().parse(DEFAULT_PROMPT_TEMPLATE)]
+
+_PROMPT_FIELDS = frozenset(field_name for _, field_name in _PROMPT_PARTS if field_name is not None)
+
+def _render_prompt(values: Dict[str, Any]) -> str:
+    """Équivalent de DEFAULT_PROMPT_TEMPLATE.format(**values) (lève KeyError si un champ manque)."""
+    # Chaque champ n'est converti qu'une fois, même s'il apparaît une douzaine de fois dans le template
+    rendered = {field_name: str(values[field_name]) for field_name in _PROMPT_FIELDS}
+    chunks = []
+    for literal, field_name in _PROMPT_PARTS:
+        chunks.append(literal)
+        if field_name is not None:
+            chunks.append(rendered[field_name])
+    return "".join(chunks)
+
+# La sortie max de Gemini (65 535 tokens) tient largement sous cette limite :
+# au-delà, la réponse est considérée comme aberrante et rejetée avant tout scan.
+MAX_RESPONSE_CHARS = 512_000
+
 def parse_gemini_response(response_text: str) -> Dict[str, Any] | None:
+    if len(response_text) > MAX_RESPONSE_CHARS:
+        logging.error(f"Response too large to be a script ({len(response_text)} chars > {MAX_RESPONSE_CHARS}).")
+        return None
+
     # Try to find the JSON block
     # Use triple quotes for the multi-line raw string regex
     json_match = re.search(r'''\`\`\`json
@@ -143,8 +176,11 @@ def parse_gemini_response(response_text: str) -> Dict[str, Any] | None:
     json_str = json_str.strip()
     
     try:
-        data = json.loads(json_str)
-    except json.JSONDecodeError as e:
+        if _json_fast:
+            data = _json_fast.loads(json_str.encode('utf-8'))
+        else:
+            data = json.loads(json_str)
+    except json.JSONDecodeError as e: # orjson.JSONDecodeError hérite de json.JSONDecodeError
         logging.error(f"Failed to parse JSON: {e}")
         logging.debug(f"Invalid JSON string received:\\n{json_str}")
         return None
@@ -159,6 +195,9 @@ def parse_gemini_response(response_text: str) -> Dict[str, Any] | None:
          logging.warning("JSON 'scenes' field is not a valid non-empty list.")
          return None
          
+    # Listes de mots-clés identiques partagées entre scènes (un seul tuple par valeur)
+    keywords_cache: Dict[tuple, tuple] = {}
+
     # Validate scenes structure (add more checks if needed)
     for i, scene in enumerate(data["scenes"]):
         # Common keys for all visual types
@@ -166,6 +205,11 @@ def parse_gemini_response(response_text: str) -> Dict[str, Any] | None:
         
         # Keys specific to certain visual types
         visual_type = scene.get("visual_type")
+        # Les valeurs de type enum se répètent à chaque scène : on partage une seule instance
+        if isinstance(visual_type, str):
+            visual_type = scene["visual_type"] = sys.intern(visual_type)
+        if isinstance(scene.get("sound_cue"), str):
+            scene["sound_cue"] = sys.intern(scene["sound_cue"])
         current_scene_keys_required = list(scene_keys_common) # Start with common keys
 
         if visual_type in ["hook", "stock_video", "ai_image", "product_shot"]:
@@ -181,6 +225,9 @@ def parse_gemini_response(response_text: str) -> Dict[str, Any] | None:
         if visual_type == "product_video" and "search_keywords" in scene and scene.get("search_keywords"): # Check if it's not an empty list for product_video
             logging.warning(f"Scene {i+1} (product_video): 'search_keywords' should be an empty list [] but found {scene.get('search_keywords')}.")
             # return None # Optionnel: être strict
+        if "search_keywords" in scene and all(isinstance(kw, str) for kw in scene["search_keywords"]):
+            keywords = tuple(scene["search_keywords"])
+            scene["search_keywords"] = keywords_cache.setdefault(keywords, keywords)
 
         if not all(key in scene for key in current_scene_keys_required):
              logging.warning(f"Scene {i+1} (type: {visual_type}) is missing one or more required keys from {current_scene_keys_required}. Found: {list(scene.keys())}")
@@ -212,14 +259,14 @@ def generate_script(
     
     # Format the new prompt template
     try:
-        prompt = DEFAULT_PROMPT_TEMPLATE.format(
+        prompt = _render_prompt(dict(
             PRODUCT_INFO=product_info,
             TOPIC=topic,
             HOOK_DESCRIPTION=hook_desc_for_prompt,
             TARGET_DURATION=target_duration_seconds
             # LANGUAGE is not directly used in this prompt template,
             # NUM_SCENES is also not used as the new prompt focuses on duration
-        )
+        ))
     except KeyError as e:
         logging.error(f"Missing key in prompt template formatting: {e}")
         return None
@@ -249,12 +296,17 @@ def generate_script(
 
     return script_data
 
-def save_script(script_data: Dict[str, Any], output_path: Path) -> None:
-    """Save the script data as a JSON file."""
+def save_script(script_data: Dict[str, Any], output_path: str | os.PathLike) -> None:
+    """Save the script data as a JSON file (accepts a str or any path-like object)."""
+    output_path = os.fspath(output_path)
     try:
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_path, "w", encoding='utf-8') as f:
-            json.dump(script_data, f, indent=2, ensure_ascii=False)
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        if _json_fast:
+            with open(output_path, "wb") as f:
+                f.write(_json_fast.dumps(script_data, option=_json_fast.OPT_INDENT_2 | _json_fast.OPT_NON_STR_KEYS))
+        else:
+            with open(output_path, "w", encoding='utf-8') as f:
+                json.dump(script_data, f, indent=2, ensure_ascii=False)
         logging.info(f"✅ Script saved to: {output_path}")
     except IOError as e:
         logging.error(f"Failed to save script to {output_path}: {e}")
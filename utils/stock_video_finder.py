@@ -1,22 +1,55 @@
 import os
 import random
+import functools
+import itertools
 import hashlib # For MD5 hashing
 import json # Needed for loading script_data in __main__
 from typing import List, Dict, Any # Use Dict instead of MaterialInfo for simplicity
 from urllib.parse import urlencode
 from pathlib import Path
 import re
+import asyncio
+import atexit
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from loguru import logger
-from moviepy.video.io.VideoFileClip import VideoFileClip
 
 # Import the new config loader
 from .config_loader import get_pexels_api_key, get_pixabay_api_key, get_config
 from .script_generator_gemini import generate_text
 
+try:
+    import orjson as _json_fast # Optionnel : parse directement les bytes des réponses API
+except ImportError:
+    _json_fast = None
+
 # Define TikTok aspect ratio directly
 TIKTOK_ASPECT = (1080, 1920) # width, height
+STOCK_VISUAL_TYPES = frozenset({"stock_video", "hook"}) # Types de scène illustrés par une vidéo stock
+SEARCH_MAX_WORKERS = 8 # Scènes recherchées en parallèle
+DOWNLOAD_MAX_WORKERS = 4 # Téléchargements MP4 simultanés
+MAX_VIDEO_SIZE_BYTES = 100 * 1024 * 1024 # Au-delà, un clip stock n'est pas téléchargé
+DOWNLOAD_CHUNK_SIZE = 128 * 1024 # Gros blocs : moins d'itérations Python et d'appels write
+
+# --- Session HTTP partagée ---
+# Une seule session pour toutes les requêtes : les connexions TCP/TLS vers Pexels, Pixabay
+# et leurs CDN sont réutilisées (keep-alive) au lieu d'être renégociées à chaque appel.
+_SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+)
+_SESSION.mount("https://", _adapter)
+_SESSION.mount("http://", _adapter)
+atexit.register(_SESSION.close)
 
 # Remove MaterialInfo dependency and related schema imports
 # from app.models.schema import MaterialInfo, VideoAspect, VideoConcatMode
@@ -24,42 +57,143 @@ TIKTOK_ASPECT = (1080, 1920) # width, height
 # Remove app.utils dependency - reimplement md5 or import hashlib
 # from app.utils import utils
 
+# --- Config lue à chaque recherche/téléchargement, résolue une seule fois ---
+@functools.lru_cache(maxsize=1)
+def _load_cfg() -> Dict[str, Any]:
+    return {
+        "proxy": get_config("proxy"),
+        "pexels_api_keys": get_config("pexels_api_keys"),
+        "pixabay_api_keys": get_config("pixabay_api_keys"),
+    }
+
+def reload_config() -> None:
+    """Forces the next search/download to re-read proxy and API keys from the config."""
+    _load_cfg.cache_clear()
+
 # --- Rotation des clés API ---
-_pexels_key_index = 0
-_pixabay_key_index = 0
+# Un itertools.cycle par fournisseur, protégé par son propre verrou (recherches multi-threads).
+# Le cycle est recréé si la liste de clés change (ex: après reload_config()).
+_key_cycles: Dict[str, tuple] = {} # key_type -> (clés, cycle)
+_key_cycle_locks = {"pexels": threading.Lock(), "pixabay": threading.Lock()}
 
 def get_rotating_api_key(api_keys: list, key_type: str = "pexels"):
-    global _pexels_key_index, _pixabay_key_index
     if not api_keys:
         raise ValueError("Aucune clé API fournie.")
     if isinstance(api_keys, str):
         return api_keys
-    if key_type == "pexels":
-        idx = _pexels_key_index
-        _pexels_key_index = (idx + 1) % len(api_keys)
-        return api_keys[idx]
-    elif key_type == "pixabay":
-        idx = _pixabay_key_index
-        _pixabay_key_index = (idx + 1) % len(api_keys)
-        return api_keys[idx]
-    else:
+    lock = _key_cycle_locks.get(key_type)
+    if lock is None:
         return api_keys[0]
+    keys = tuple(api_keys)
+    with lock:
+        entry = _key_cycles.get(key_type)
+        if entry is None or entry[0] != keys:
+            entry = _key_cycles[key_type] = (keys, itertools.cycle(keys))
+        return next(entry[1])
 
 def md5(text: str) -> str:
-    """Calculate the MD5 hash of a string."""
-    return hashlib.md5(text.encode('utf-8')).hexdigest()
+    """Calculate the MD5 hash of a string (file naming only, not a security use)."""
+    return hashlib.md5(text.encode('utf-8'), usedforsecurity=False).hexdigest()
 
 # Remove old get_api_key
 # requested_count = 0
 # def get_api_key(cfg_key: str):
 # ...
 
+# (provider, mot-clé, durée min) -> résultats : les scènes partageant un mot-clé ne refont pas
+# la requête. Seules les recherches abouties sont mémorisées, une erreur réseau sera retentée.
+# LRU borné : les entrées les moins récemment utilisées sont évincées au-delà de la limite.
+SEARCH_CACHE_MAX_ENTRIES = 256
+_SEARCH_CACHE: "OrderedDict[tuple, tuple]" = OrderedDict()
+_search_cache_lock = threading.Lock()
+
+def _remember_search(key: tuple, value: tuple) -> None:
+    with _search_cache_lock:
+        _SEARCH_CACHE[key] = value
+        _SEARCH_CACHE.move_to_end(key)
+        if len(_SEARCH_CACHE) > SEARCH_CACHE_MAX_ENTRIES:
+            _SEARCH_CACHE.popitem(last=False)
+
+# Cache persistant (SQLite) des mêmes résultats, partagé entre les runs d'un projet.
+# Activé par open_search_cache() ; les entrées plus vieilles que le TTL sont ignorées.
+SEARCH_CACHE_TTL_SECONDS = 24 * 3600
+_search_db: sqlite3.Connection | None = None
+_search_db_lock = threading.Lock()
+
+def open_search_cache(db_path: Path) -> None:
+    """Enables the persistent keyword -> results cache stored in the SQLite file db_path."""
+    global _search_db
+    with _search_db_lock:
+        if _search_db is not None:
+            _search_db.close()
+            _search_db = None
+        try:
+            _search_db = sqlite3.connect(str(db_path), check_same_thread=False)
+            _search_db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                "provider TEXT, keyword TEXT, min_duration REAL, ts REAL, result_json BLOB, "
+                "PRIMARY KEY (provider, keyword, min_duration))"
+            )
+            _search_db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Persistent search cache disabled, could not open {db_path}: {e}")
+            _search_db = None
+
+def _close_search_cache() -> None:
+    global _search_db
+    with _search_db_lock:
+        if _search_db is not None:
+            _search_db.close()
+            _search_db = None
+
+atexit.register(_close_search_cache)
+
+def _get_cached_search(key: tuple) -> tuple | None:
+    with _search_cache_lock:
+        cached = _SEARCH_CACHE.get(key)
+        if cached is not None:
+            _SEARCH_CACHE.move_to_end(key)
+    if cached is not None or _search_db is None:
+        return cached
+    try:
+        with _search_db_lock:
+            row = _search_db.execute(
+                "SELECT ts, result_json FROM search_cache WHERE provider = ? AND keyword = ? AND min_duration = ?", key
+            ).fetchone()
+    except (sqlite3.Error, AttributeError) as e: # AttributeError : cache fermé entre-temps
+        logger.warning(f"Persistent search cache read failed: {e}")
+        return None
+    if row is None or time.time() - row[0] > SEARCH_CACHE_TTL_SECONDS:
+        return None
+    cached = tuple(_json_fast.loads(row[1]) if _json_fast else json.loads(row[1]))
+    _remember_search(key, cached)
+    return cached
+
+def _store_search(key: tuple, video_items: List[Dict]) -> None:
+    _remember_search(key, tuple(dict(item) for item in video_items))
+    if _search_db is None:
+        return
+    result_json = _json_fast.dumps(video_items) if _json_fast else json.dumps(video_items).encode('utf-8')
+    try:
+        with _search_db_lock:
+            _search_db.execute(
+                "INSERT OR REPLACE INTO search_cache (provider, keyword, min_duration, ts, result_json) VALUES (?, ?, ?, ?, ?)",
+                (*key, time.time(), result_json),
+            )
+            _search_db.commit()
+    except (sqlite3.Error, AttributeError) as e:
+        logger.warning(f"Persistent search cache write failed: {e}")
+
 def search_videos_pexels(
     search_term: str,
     minimum_duration: int,
 ) -> List[Dict]:
+    cached = _get_cached_search(("pexels", search_term, minimum_duration))
+    if cached is not None:
+        logger.debug(f"Pexels search for '{search_term}' served from cache.")
+        return [dict(item) for item in cached]
     video_width, video_height = TIKTOK_ASPECT
-    api_keys = get_config("pexels_api_keys") or get_pexels_api_key()
+    api_keys = _load_cfg()["pexels_api_keys"] or get_pexels_api_key()
     api_key = get_rotating_api_key(api_keys, key_type="pexels")
     headers = {
         "Authorization": api_key,
@@ -67,12 +201,12 @@ def search_videos_pexels(
     }
     params = {"query": search_term, "per_page": 10, "orientation": "portrait"}
     query_url = f"https://api.pexels.com/videos/search?{urlencode(params)}"
-    proxy_config = get_config("proxy")
+    proxy_config = _load_cfg()["proxy"]
     logger.debug(f"Searching Pexels videos: {query_url}, with proxies: {proxy_config}")
     try:
-        r = requests.get(query_url, headers=headers, proxies=proxy_config, timeout=(30, 60))
+        r = _SESSION.get(query_url, headers=headers, proxies=proxy_config, timeout=(30, 60))
         r.raise_for_status()
-        response = r.json()
+        response = _json_fast.loads(r.content) if _json_fast else r.json()
         video_items = []
         if "videos" not in response:
             logger.warning(f"Pexels: pas de vidéos pour {search_term}")
@@ -83,23 +217,21 @@ def search_videos_pexels(
             if duration < minimum_duration:
                 continue
             video_files = v.get("video_files", [])
-            found_link = None
-            best_area = 0
+            portrait_files = []
             for video in video_files:
                 w = video.get("width")
                 h = video.get("height")
-                link = video.get("link")
-                if w is None or h is None or link is None:
+                if w is None or h is None or video.get("link") is None:
                     logger.warning(f"Vidéo incomplète ignorée: {video}")
                     continue
                 if h > w:
-                    if w == video_width and h == video_height:
-                        found_link = link
-                        break
-                    area = w * h
-                    if area > best_area:
-                        found_link = link
-                        best_area = area
+                    portrait_files.append(video)
+            # Format TikTok exact en priorité, sinon la plus grande résolution portrait (réduction faite en C par max)
+            best_file = next(
+                (vf for vf in portrait_files if vf["width"] == video_width and vf["height"] == video_height),
+                None,
+            ) or max(portrait_files, key=lambda vf: vf["width"] * vf["height"], default=None)
+            found_link = best_file["link"] if best_file else None
             if found_link:
                 item = {
                     "provider": "pexels",
@@ -108,6 +240,7 @@ def search_videos_pexels(
                 }
                 video_items.append(item)
         logger.info(f"Pexels search for '{search_term}' returned {len(video_items)} portrait videos.")
+        _store_search(("pexels", search_term, minimum_duration), video_items)
         return video_items
     except requests.exceptions.RequestException as e:
         logger.error(f"Erreur réseau Pexels: {e}")
@@ -122,8 +255,12 @@ def search_videos_pixabay(
     search_term: str,
     minimum_duration: int,
 ) -> List[Dict]:
+    cached = _get_cached_search(("pixabay", search_term, minimum_duration))
+    if cached is not None:
+        logger.debug(f"Pixabay search for '{search_term}' served from cache.")
+        return [dict(item) for item in cached]
     video_width, video_height = TIKTOK_ASPECT
-    api_keys = get_config("pixabay_api_keys") or get_pixabay_api_key()
+    api_keys = _load_cfg()["pixabay_api_keys"] or get_pixabay_api_key()
     api_key = get_rotating_api_key(api_keys, key_type="pixabay")
     params = {
         "q": search_term,
@@ -133,12 +270,12 @@ def search_videos_pixabay(
         "key": api_key,
     }
     query_url = f"https://pixabay.com/api/videos/?{urlencode(params)}"
-    proxy_config = get_config("proxy")
+    proxy_config = _load_cfg()["proxy"]
     logger.debug(f"Searching Pixabay videos: {query_url}, with proxies: {proxy_config}")
     try:
-        r = requests.get(query_url, proxies=proxy_config, timeout=(30, 60))
+        r = _SESSION.get(query_url, proxies=proxy_config, timeout=(30, 60))
         r.raise_for_status()
-        response = r.json()
+        response = _json_fast.loads(r.content) if _json_fast else r.json()
         video_items = []
         if "hits" not in response:
             logger.warning(f"Pixabay: pas de vidéos pour {search_term}")
@@ -162,6 +299,7 @@ def search_videos_pixabay(
                     }
                     video_items.append(item)
         logger.info(f"Pixabay search for '{search_term}' returned {len(video_items)} portrait videos.")
+        _store_search(("pixabay", search_term, minimum_duration), video_items)
         return video_items
     except requests.exceptions.RequestException as e:
         logger.error(f"Erreur réseau Pixabay: {e}")
@@ -172,15 +310,74 @@ def search_videos_pixabay(
     return []
 
 
+def _is_downloadable(video_url: str, headers: Dict[str, str], proxy_config) -> bool:
+    """
+    HEAD request made before committing to a full MP4 download: rejects dead links,
+    non-video content and oversized files. Inconclusive answers (HEAD unsupported,
+    network error, missing headers) let the download proceed.
+    """
+    try:
+        r = _SESSION.head(video_url, headers=headers, proxies=proxy_config, timeout=(10, 30), allow_redirects=True)
+    except requests.exceptions.RequestException as e:
+        logger.debug(f"HEAD request failed for {video_url}, trying the download anyway: {e}")
+        return True
+    if r.status_code in (404, 410):
+        logger.warning(f"Video link is dead (HTTP {r.status_code}): {video_url}")
+        return False
+    if r.status_code != 200:
+        return True
+    content_type = r.headers.get("Content-Type", "")
+    if content_type and not content_type.startswith(("video/", "application/octet-stream")):
+        logger.warning(f"Skipping download, unexpected Content-Type '{content_type}': {video_url}")
+        return False
+    content_length = r.headers.get("Content-Length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_VIDEO_SIZE_BYTES:
+        logger.warning(f"Skipping download, file too large ({int(content_length) / 1e6:.0f} MB): {video_url}")
+        return False
+    return True
+
+def _file_size(path: Path) -> int:
+    """Size of path in bytes, 0 if it does not exist (one stat call instead of exists() + stat())."""
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+# (save_dir, url sans query) -> chemin local : évite hash + stat pour une URL déjà traitée dans ce process
+_DOWNLOAD_CACHE: Dict[tuple, str] = {}
+
+def search_videos_multi(
+    keywords: List[str],
+    minimum_duration: int,
+    source: str = "pexels",
+) -> List[Dict]:
+    """
+    Searches several keywords with one request to a single provider.
+    Neither Pexels nor Pixabay has an OR operator: the terms are sent as one space-separated
+    query, which both APIs rank by relevance to all terms. Returns [] if nothing matches.
+    """
+    query = " ".join(keywords)
+    if source == "pixabay":
+        return search_videos_pixabay(query, minimum_duration)
+    return search_videos_pexels(query, minimum_duration)
+
+
 def save_video(video_url: str, save_dir: Path) -> str:
     """Downloads and saves a video, returning the path or empty string on failure."""
     if not video_url:
         return ""
 
+    url_without_query = video_url.split("?")[0]
+    cache_key = (str(save_dir), url_without_query)
+    cached_path = _DOWNLOAD_CACHE.get(cache_key)
+    if cached_path:
+        if Path(cached_path).is_file():
+            return cached_path
+        _DOWNLOAD_CACHE.pop(cache_key, None) # Fichier supprimé depuis : on le retélécharge
+
     save_dir.mkdir(parents=True, exist_ok=True)
 
     try:
-        url_without_query = video_url.split("?")[0]
         url_hash = md5(url_without_query)
         # Include provider in hash/ID to avoid potential collisions if URL is somehow identical
         provider = "generic"
@@ -189,24 +386,35 @@ def save_video(video_url: str, save_dir: Path) -> str:
         video_id = f"vid-{provider}-{url_hash}" 
         video_path = save_dir / f"{video_id}.mp4"
 
-        if video_path.exists() and video_path.stat().st_size > 1024: # Check for non-trivial size
+        if _file_size(video_path) > 1024: # Check for non-trivial size (single stat call)
             logger.info(f"Video already exists: {video_path}")
             # Quick verification if possible without full load
             # For now, assume existing file is okay if size > 1KB
+            _DOWNLOAD_CACHE[cache_key] = str(video_path)
             return str(video_path)
 
         headers = {"User-Agent": "Mozilla/5.0"}
-        proxy_config = get_config("proxy")
+        proxy_config = _load_cfg()["proxy"]
+
+        if not _is_downloadable(video_url, headers, proxy_config):
+            return ""
 
+        tmp_path = video_path.with_name(video_path.name + ".part")
         logger.info(f"Downloading video: {video_url} to {video_path}")
-        with requests.get(video_url, headers=headers, proxies=proxy_config, stream=True, timeout=(60, 300)) as r: # Increased download timeout
+        with _SESSION.get(video_url, headers=headers, proxies=proxy_config, stream=True, timeout=(60, 300)) as r: # Increased download timeout
             r.raise_for_status()
-            with open(video_path, "wb") as f:
-                for chunk in r.iter_content(chunk_size=8192):
+            # Écriture dans un .part renommé seulement une fois le flux complet : un téléchargement
+            # interrompu ne laisse jamais un MP4 tronqué qui passerait le test de taille au run suivant.
+            with open(tmp_path, "wb") as f:
+                for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
                     f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, video_path)
 
-        if video_path.exists() and video_path.stat().st_size > 1024:
+        if _file_size(video_path) > 1024:
             # Verify the downloaded video is valid using moviepy (optional, can be slow)
+            # from moviepy.video.io.VideoFileClip import VideoFileClip # Import local : moviepy est lourd à charger
             # try:
             #     with VideoFileClip(str(video_path)) as clip:
             #         duration = clip.duration
@@ -223,22 +431,33 @@ def save_video(video_url: str, save_dir: Path) -> str:
             #     video_path.unlink(missing_ok=True)
             #     return ""
             logger.info(f"Video downloaded successfully: {video_path}")
+            _DOWNLOAD_CACHE[cache_key] = str(video_path)
             return str(video_path) # Assume success if downloaded with size
         else:
              logger.error(f"Failed to save video after download (size <= 1KB?): {video_path}")
-             if video_path.exists(): video_path.unlink(missing_ok=True)
+             video_path.unlink(missing_ok=True)
              return ""
              
     except requests.exceptions.RequestException as e:
          logger.error(f"Failed to download video {video_url}: {e}")
+         if 'tmp_path' in locals():
+             try: tmp_path.unlink(missing_ok=True)
+             except OSError: pass
          return ""
     except Exception as e:
         logger.error(f"Error saving video {video_url}: {e}")
+        if 'tmp_path' in locals():
+             try: tmp_path.unlink(missing_ok=True)
+             except OSError: pass
         if 'video_path' in locals() and video_path.exists():
              try: video_path.unlink(missing_ok=True)
              except OSError: pass
         return ""
 
+# Liste Python renvoyée par Gemini, ex: ['mot1', 'mot2', 'mot3']
+_KW_LIST_RE = re.compile(r'\[(.*?)\]', re.DOTALL)
+_KW_SPLIT_RE = re.compile(r'\s*,\s*')
+
 def generate_alternative_keywords(scene, product_info=None):
     """Appelle Gemini pour générer 3 nouveaux mots-clés larges pour une scène donnée."""
     visual_desc = scene.get("visual_description", "")
@@ -256,9 +475,9 @@ def generate_alternative_keywords(scene, product_info=None):
         return []
     # Extraction robuste de la liste Python
     try:
-        match = re.search(r'\[(.*?)\]', response, re.DOTALL)
+        match = _KW_LIST_RE.search(response)
         if match:
-            keywords = [k.strip(" ' \"") for k in match.group(1).split(',') if k.strip()]
+            keywords = [k.strip(" ' \"") for k in _KW_SPLIT_RE.split(match.group(1)) if k.strip()]
             return keywords
         else:
             logger.error(f"Réponse Gemini inattendue : {response}")
@@ -272,11 +491,13 @@ def find_and_download_stock_videos(
     script_data: Dict[str, Any],
     output_dir: Path,
     preferred_source: str = "pexels", # pexels or pixabay - this will be used as a starting point per keyword
-    videos_per_scene: int = 1
+    videos_per_scene: int = 1,
+    batch_keywords: bool = False # Optionnel : tente d'abord une seule requête regroupant tous les mots-clés de la scène
 ) -> Dict[int, List[str]]:
     """
     Finds and downloads stock videos for each scene based on search_keywords.
-    Iterates through keywords sequentially, stopping when videos are found for a scene.
+    When batch_keywords is set, a single query combining all keywords of a scene is tried first;
+    otherwise (or if it finds nothing) keywords are tried sequentially, stopping when videos are found.
     """
     downloaded_scene_videos: Dict[int, List[str]] = {}
     if not script_data or "scenes" not in script_data:
@@ -285,43 +506,52 @@ def find_and_download_stock_videos(
 
     video_cache_dir = output_dir / "stock_videos_cache"
     video_cache_dir.mkdir(parents=True, exist_ok=True)
+    open_search_cache(output_dir / "stock_search_cache.sqlite")
 
     scenes = script_data.get("scenes", [])
     product_info = script_data.get("product_info", None) or script_data.get("product", None)
 
-    for scene_index, scene in enumerate(scenes):
-        scene_number = scene.get("scene_number", scene_index + 1) # Use scene_number if available
-        visual_type = scene.get("visual_type")
-        
-        # Skip if visual_type is product_video or not relevant for stock video search
-        if visual_type == "product_video":
-            logger.info(f"Scene {scene_number}: Skipping stock video search, visual_type is 'product_video'. A local product video is expected.")
-            downloaded_scene_videos[scene_number] = [] # No stock videos to download
-            continue
-        elif visual_type not in ["stock_video", "hook"]: # 'hook' might also use stock
-            logger.info(f"Scene {scene_number}: Skipping stock video search, visual_type is '{visual_type}'.")
-            downloaded_scene_videos[scene_number] = []
-            continue
-
+    # Téléchargements partagés entre scènes : une URL déjà demandée par une autre scène
+    # réutilise le même Future au lieu d'être téléchargée une seconde fois.
+    download_executor = ThreadPoolExecutor(max_workers=DOWNLOAD_MAX_WORKERS)
+    download_futures: Dict[str, Future] = {}
+    download_lock = threading.Lock()
+
+    def _download(video_url: str) -> Future:
+        with download_lock:
+            future = download_futures.get(video_url)
+            if future is None:
+                future = download_futures[video_url] = download_executor.submit(save_video, video_url, video_cache_dir)
+        return future
+
+    def _process_scene(scene_number, scene: Dict[str, Any]) -> tuple:
+        """Searches and downloads the videos of one scene, returns (scene_number, paths)."""
         search_keywords_list = scene.get("search_keywords", [])
-        if not isinstance(search_keywords_list, list) or not search_keywords_list:
+        if not isinstance(search_keywords_list, (list, tuple)) or not search_keywords_list:
             logger.warning(f"Scene {scene_number}: No search_keywords provided or not a list.")
-            downloaded_scene_videos[scene_number] = []
-            continue
+            return scene_number, []
         
         # Ensure keywords are strings
         search_keywords_list = [kw for kw in search_keywords_list if isinstance(kw, str) and kw.strip()]
         if not search_keywords_list:
             logger.warning(f"Scene {scene_number}: All keywords were empty or invalid.")
-            downloaded_scene_videos[scene_number] = []
-            continue
+            return scene_number, []
 
         minimum_duration = scene.get("duration_seconds", 3) # Default to scene duration
         found_videos_for_scene: List[Dict[str, Any]] = []
 
-        logger.info(f"Scene {scene_number}: Processing keywords {search_keywords_list} sequentially.")
+        keywords_to_try = search_keywords_list
+        if batch_keywords and len(search_keywords_list) > 1:
+            batched_videos = search_videos_multi(search_keywords_list, minimum_duration, preferred_source)
+            if batched_videos:
+                logger.info(f"Scene {scene_number}: Found {len(batched_videos)} videos with a single batched query for {search_keywords_list}.")
+                found_videos_for_scene.extend(batched_videos)
+                keywords_to_try = [] # Inutile d'essayer les mots-clés un par un
+
+        if keywords_to_try:
+            logger.info(f"Scene {scene_number}: Processing keywords {keywords_to_try} sequentially.")
 
-        for keyword in search_keywords_list:
+        for keyword in keywords_to_try:
             logger.info(f"Scene {scene_number}: Trying keyword '{keyword}'...")
             
             pexels_videos: List[Dict[str, Any]] = []
@@ -391,37 +621,77 @@ def find_and_download_stock_videos(
         scene_video_paths: List[str] = []
         if not found_videos_for_scene:
             logger.warning(f"Scene {scene_number}: No stock videos found after trying all keywords: {search_keywords_list}.")
-            downloaded_scene_videos[scene_number] = []
-            continue
+            return scene_number, []
 
         # Shuffle to get variety if multiple videos were found for the successful keyword
         random.shuffle(found_videos_for_scene)
         
-        download_count = 0
+        candidate_urls: List[str] = []
         for video_info in found_videos_for_scene:
-            if download_count >= videos_per_scene:
-                break
-            
             video_url = video_info.get("url")
             if video_url:
-                saved_path = save_video(video_url, video_cache_dir)
+                candidate_urls.append(video_url)
+            else:
+                logger.warning(f"Scene {scene_number}: Video info missing URL: {video_info}")
+        candidate_urls = list(dict.fromkeys(candidate_urls)) # Dédoublonne en gardant l'ordre
+
+        # Télécharge par lots concurrents juste assez de vidéos pour atteindre videos_per_scene
+        download_count = 0
+        while download_count < videos_per_scene and candidate_urls:
+            needed = videos_per_scene - download_count
+            batch, candidate_urls = candidate_urls[:needed], candidate_urls[needed:]
+            futures = [_download(video_url) for video_url in batch]
+            for video_url, future in zip(batch, futures):
+                saved_path = future.result()
                 if saved_path:
                     scene_video_paths.append(saved_path)
                     download_count += 1
                     logger.info(f"Scene {scene_number}: Successfully downloaded video {download_count}/{videos_per_scene} from {video_url}")
                 else:
                     logger.warning(f"Scene {scene_number}: Failed to download video from {video_url}")
-            else:
-                logger.warning(f"Scene {scene_number}: Video info missing URL: {video_info}")
 
-        downloaded_scene_videos[scene_number] = scene_video_paths
         if not scene_video_paths:
             logger.warning(f"Scene {scene_number}: Despite finding video metadata, failed to download any actual video files.")
+        return scene_number, scene_video_paths
 
+    # Seules les scènes stock_video/hook ('hook' peut aussi venir d'une banque) entrent dans la
+    # boucle de recherche ; les autres reçoivent directement une liste vide, dans l'ordre du script.
+    eligible_numbers: List[Any] = []
+    eligible_scenes: List[Dict[str, Any]] = []
+    for scene_index, scene in enumerate(scenes):
+        scene_number = scene.get("scene_number", scene_index + 1) # Use scene_number if available
+        downloaded_scene_videos[scene_number] = []
+        if scene.get("visual_type") in STOCK_VISUAL_TYPES:
+            eligible_numbers.append(scene_number)
+            eligible_scenes.append(scene)
+    skipped_count = len(scenes) - len(eligible_scenes)
+    if skipped_count:
+        logger.info(f"Skipping stock video search for {skipped_count} scene(s) whose visual_type is not in {sorted(STOCK_VISUAL_TYPES)} (product_video scenes expect a local video).")
+
+    # Les recherches sont limitées par le réseau : les scènes sont traitées en parallèle,
+    # les mots-clés d'une même scène restent essayés dans l'ordre (arrêt au premier résultat).
+    with download_executor, ThreadPoolExecutor(max_workers=SEARCH_MAX_WORKERS) as executor:
+        for scene_number, scene_video_paths in executor.map(_process_scene, eligible_numbers, eligible_scenes):
+            downloaded_scene_videos[scene_number] = scene_video_paths
 
     logger.info("Finished processing all scenes for stock videos.")
     return downloaded_scene_videos
 
+async def find_and_download_stock_videos_async(
+    script_data: Dict[str, Any],
+    output_dir: Path,
+    preferred_source: str = "pexels",
+    videos_per_scene: int = 1,
+    batch_keywords: bool = False
+) -> Dict[int, List[str]]:
+    """
+    Async entry point for callers running an event loop: the search/download work runs in a
+    worker thread (where scenes and downloads are already parallelized) without blocking the loop.
+    """
+    return await asyncio.to_thread(
+        find_and_download_stock_videos, script_data, output_dir, preferred_source, videos_per_scene, batch_keywords
+    )
+
 # Remove old download_videos function
 # def download_videos(...):
 # ...
@@ -444,8 +714,12 @@ if __name__ == "__main__":
             "total_duration_estimated": 35
         }
         try:
-            with open(test_script_file, 'w', encoding='utf-8') as f:
-                json.dump(dummy_script, f, indent=2)
+            if _json_fast:
+                with open(test_script_file, 'wb') as f:
+                    f.write(_json_fast.dumps(dummy_script, option=_json_fast.OPT_INDENT_2))
+            else:
+                with open(test_script_file, 'w', encoding='utf-8') as f:
+                    json.dump(dummy_script, f, indent=2)
             logger.info(f"Created dummy script file for testing: {test_script_file}")
             script_data_main = dummy_script
         except Exception as e:
@@ -453,8 +727,11 @@ if __name__ == "__main__":
             script_data_main = None
     else:
          try:
-             with open(test_script_file, 'r', encoding='utf-8') as f:
-                 script_data_main = json.load(f)
+             if _json_fast:
+                 script_data_main = _json_fast.loads(test_script_file.read_bytes())
+             else:
+                 with open(test_script_file, 'r', encoding='utf-8') as f:
+                     script_data_main = json.load(f)
              logger.info(f"Loaded test script file: {test_script_file}")
          except Exception as e:
              logger.error(f"Could not load test script file {test_script_file}: {e}")
@@ -470,7 +747,10 @@ if __name__ == "__main__":
                 videos_per_scene=2
             )
             print("\n--- Download Results Map --- ")
-            print(json.dumps(download_map, indent=2))
+            if _json_fast:
+                print(_json_fast.dumps(download_map, option=_json_fast.OPT_INDENT_2 | _json_fast.OPT_NON_STR_KEYS).decode())
+            else:
+                print(json.dumps(download_map, indent=2))
             print(f"Check downloaded files in: {test_output_dir_main / 'stock_videos'}")
 
         except ValueError as ve:
@@ -4,18 +4,26 @@ from .google_api import analyze_video # Import from the local google_api module
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# (chemin vidéo, mtime) -> description : évite de relire le .txt à chaque appel dans un même run.
+# Le mtime dans la clé invalide l'entrée si la vidéo est remplacée.
+_DESCRIPTION_MEMORY_CACHE: dict[tuple[str, float], str] = {}
+
 def get_hook_description(video_path: str, request_timeout: int = 600) -> str | None:
     """
     Analyzes the hook video using Gemini or loads from a local cache 
     and returns its description.
     The description is cached in a .txt file with the same name as the video
-    in the same directory.
+    in the same directory, and in memory for repeated calls within the process.
     """
     video_file = Path(video_path)
     if not video_file.is_file():
         logging.error(f"Hook video file not found: {video_path}")
         return None
 
+    memory_key = (str(video_file), video_file.stat().st_mtime)
+    if memory_key in _DESCRIPTION_MEMORY_CACHE:
+        return _DESCRIPTION_MEMORY_CACHE[memory_key]
+
     # Define the path for the cached description file
     description_cache_file = video_file.with_suffix('.txt')
 
@@ -25,6 +33,7 @@ def get_hook_description(video_path: str, request_timeout: int = 600) -> str | N
             description = description_cache_file.read_text(encoding='utf-8')
             if description.strip(): # Ensure content is not just whitespace
                 logging.info(f"Loaded hook description from cache: {description_cache_file}")
+                _DESCRIPTION_MEMORY_CACHE[memory_key] = description.strip()
                 return description.strip()
             else:
                 logging.warning(f"Cached description file {description_cache_file} is empty. Will re-analyze.")
@@ -50,6 +59,7 @@ def get_hook_description(video_path: str, request_timeout: int = 600) -> str | N
                 logging.info(f"Saved hook description to cache: {description_cache_file}")
             except Exception as e:
                 logging.warning(f"Failed to save hook description to cache {description_cache_file}: {e}")
+            _DESCRIPTION_MEMORY_CACHE[memory_key] = description
             return description
         else:
             logging.warning("Hook video analysis returned no description (possibly blocked or empty).")
@@ -1,9 +1,17 @@
 import os
 import random
 import logging
+import shutil
+import functools
+import subprocess
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, Any, List, Tuple
 
+import numpy as np
+
 from moviepy.editor import (
     VideoFileClip,
     ImageClip,
@@ -13,9 +21,14 @@ from moviepy.editor import (
     ColorClip,
     TextClip # Keep for potential error messages
 )
-from moviepy.video.fx.all import fadein, fadeout # MODIFIÉ
 import moviepy.video.fx.all as vfx # AJOUTÉ
-from moviepy.config import change_settings
+from moviepy.config import change_settings, get_setting
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+try:
+    import cv2 # Optionnel : filtres image en C optimisé (SIMD), bien plus rapides que PIL
+except ImportError:
+    cv2 = None
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -30,6 +43,32 @@ except Exception as e:
 TIKTOK_ASPECT_RATIO = (1080, 1920) # Width, Height
 DEFAULT_BG_COLOR = (0, 0, 0) # Black background for padding
 BLUR_RADIUS = 25 # Valeur pour sigma (flou gaussien)
+CONCAT_ENCODE_WORKERS = 4 # Encodages de scènes simultanés (les GPU grand public limitent les sessions NVENC)
+FRAME_QUEUE_SIZE = 8 # Frames d'avance calculées pendant que ffmpeg encode (~6 Mo chacune en 1080x1920)
+NVENC_FFMPEG_PARAMS = ["-preset", "p4", "-tune", "hq", "-rc", "vbr", "-b:v", "8M", "-pix_fmt", "yuv420p"]
+
+@functools.lru_cache(maxsize=1)
+def _nvenc_available() -> bool:
+    """Vérifie une seule fois que ffmpeg peut encoder avec h264_nvenc (GPU NVIDIA + pilote présents)."""
+    if not shutil.which("nvidia-smi"):
+        return False
+    try:
+        # Un encodage d'essai est le seul test fiable : l'encodeur peut être compilé sans GPU utilisable
+        result = subprocess.run(
+            [get_setting("FFMPEG_BINARY"), "-hide_banner", "-loglevel", "error",
+             "-f", "lavfi", "-i", "color=c=black:s=256x256:d=0.1",
+             "-c:v", "h264_nvenc", "-f", "null", "-"],
+            capture_output=True, timeout=30
+        )
+        return result.returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+def _video_encoder_settings() -> Tuple[str, List[str] | None]:
+    """Codec vidéo et paramètres ffmpeg : NVENC si disponible, sinon libx264 (encodage CPU)."""
+    if _nvenc_available():
+        return "h264_nvenc", NVENC_FFMPEG_PARAMS
+    return "libx264", None
 
 # --- Define the missing helper function --- 
 def close_clip(clip):
@@ -43,6 +82,103 @@ def close_clip(clip):
             pass
 # --- End of helper function definition ---
 
+def _loop_video(clip: Any, path: str, duration: float, loop_path: Path, target_width: int, target_height: int) -> Any:
+    """
+    Rallonge une vidéo trop courte en la bouclant dans ffmpeg (-stream_loop, copie de flux) puis
+    ouvre le fichier obtenu ; clip.loop relirait la source avec un seek à chaque tour.
+    Repli sur clip.loop si ffmpeg échoue.
+    """
+    loop_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        subprocess.run(
+            [get_setting("FFMPEG_BINARY"), "-y", "-hide_banner", "-loglevel", "error",
+             "-stream_loop", "-1", "-i", path, "-t", f"{duration:.3f}",
+             "-map", "0:v:0", "-c", "copy", str(loop_path)],
+            capture_output=True, check=True
+        )
+        looped = _open_video_fitted(str(loop_path), target_width, target_height)
+    except (OSError, subprocess.SubprocessError) as e:
+        logging.warning(f"ffmpeg loop failed for {path} ({e}). Falling back to MoviePy loop.")
+        return clip.loop(duration=duration)
+    close_clip(clip)
+    # La copie de flux coupe sur un paquet : la durée peut être très légèrement inférieure
+    return looped.subclip(0, min(duration, looped.duration))
+
+def _conform_clip(clip: Any, target_width: int, target_height: int, fps: int = 30) -> Any:
+    """
+    Garantit la taille exacte et le fps communs à toutes les scènes, condition pour une
+    concaténation "chain" (sans recomposition de chaque frame sur un fond).
+    """
+    if tuple(clip.size) != (target_width, target_height):
+        # Écart d'arrondi d'un pixel au plus après la mise à l'échelle : simple étirement
+        clip = _resize_clip(clip, (target_width, target_height))
+    clip.fps = fps
+    return clip
+
+def _set_duration_inplace(clip: Any, duration: float) -> Any:
+    """
+    clip.set_duration(duration) sans la copie du clip (et de son masque) faite par MoviePy.
+    À réserver aux clips créés pour une seule scène, que personne d'autre ne référence.
+    """
+    for target in (clip, clip.mask):
+        if target is not None:
+            target.duration = duration
+            target.end = target.start + duration
+    return clip
+
+def _fit_size(clip_w: int, clip_h: int, target_width: int, target_height: int) -> Tuple[int, int]:
+    """Dimensions (largeur, hauteur) du clip mis à l'échelle pour tenir dans la cible en gardant son ratio."""
+    if clip_w / clip_h > target_width / target_height:
+        scale_factor = target_width / clip_w # Clip plus large que la cible: ajuster par la largeur
+    else:
+        scale_factor = target_height / clip_h # Clip plus haut que la cible: ajuster par la hauteur
+    return int(clip_w * scale_factor), int(clip_h * scale_factor)
+
+@functools.lru_cache(maxsize=64)
+def _probe_video(path: str) -> Tuple[float, int, int] | None:
+    """
+    (durée, largeur, hauteur affichées) du premier flux vidéo, lus avec le binaire ffmpeg
+    configuré pour MoviePy (imageio-ffmpeg ne fournit pas ffprobe). None si la lecture échoue.
+    """
+    try:
+        infos = ffmpeg_parse_infos(path)
+        width, height = infos["video_size"]
+        if infos.get("video_rotation", 0) in (90, 270): # Vidéo de téléphone tournée : dimensions affichées inversées
+            width, height = height, width
+        return float(infos["duration"]), int(width), int(height)
+    except (OSError, ValueError, KeyError, IndexError, TypeError) as e:
+        logging.warning(f"Could not probe {path} ({e}). Opening it at full size.")
+        return None
+
+def _open_video_fitted(path: str, target_width: int, target_height: int) -> VideoFileClip:
+    """
+    Ouvre une vidéo sans piste audio, déjà mise à l'échelle par ffmpeg (filtre scale) aux
+    dimensions qui tiennent dans la cible : plus de redimensionnement PIL image par image ensuite.
+    """
+    probe = _probe_video(path)
+    if probe is None:
+        return VideoFileClip(path, audio=False)
+    _, clip_w, clip_h = probe
+    new_width, new_height = _fit_size(clip_w, clip_h, target_width, target_height)
+    return VideoFileClip(path, audio=False, target_resolution=(new_height, new_width))
+
+def _resize_clip(clip: Any, size: Tuple[int, int]) -> Any:
+    """
+    Équivalent de clip.resize(size) avec cv2.resize (noyaux SIMD) si OpenCV est installé.
+    Pour une ImageClip, fl_image n'applique le redimensionnement qu'une seule fois.
+    """
+    if cv2 is None:
+        return clip.resize(size)
+
+    def _resize_frame(frame):
+        # INTER_AREA pour réduire (pas d'aliasing), INTER_LINEAR pour agrandir
+        interpolation = cv2.INTER_AREA if frame.shape[1] > size[0] else cv2.INTER_LINEAR
+        resized = cv2.resize(frame, size, interpolation=interpolation)
+        # Les frames RGB restent en uint8 ; un masque (2D, opacité 0-1) garde ses flottants
+        return resized if resized.ndim == 2 else resized.astype(np.uint8, copy=False)
+
+    return clip.fl_image(_resize_frame, apply_to=["mask"])
+
 def _create_blurred_background(source_clip: Any, target_size: Tuple[int, int], duration: float, blur_radius: int = BLUR_RADIUS) -> VideoFileClip:
     """Crée un clip d'arrière-plan flouté et agrandi à partir du clip source."""
     # Redimensionner pour remplir la cible (peut déformer, ok pour fond flou)
@@ -71,7 +207,28 @@ def _resize_clip_for_foreground(clip: Any, target_width: int, target_height: int
         new_height = target_height
         new_width = int(new_height * clip_ratio)
     
-    return clip.resize((new_width, new_height))
+    return _resize_clip(clip, (new_width, new_height))
+
+@functools.lru_cache(maxsize=8)
+def _background_canvas(target_width: int, target_height: int, bg_color: tuple) -> np.ndarray:
+    """Fond uni de la taille cible, construit une fois par (taille, couleur) ; lecture seule, à copier."""
+    canvas = np.empty((target_height, target_width, 3), dtype=np.uint8)
+    canvas[:] = bg_color
+    canvas.flags.writeable = False
+    return canvas
+
+def _letterbox_frame(frame: np.ndarray, target_width: int, target_height: int, bg_color: tuple, mask: np.ndarray | None = None) -> np.ndarray:
+    """Centre une image sur un fond uni de la taille cible (mask : opacité 0-1 optionnelle de l'image)."""
+    canvas = _background_canvas(target_width, target_height, tuple(bg_color)).copy()
+    h, w = frame.shape[:2]
+    x0, y0 = (target_width - w) // 2, (target_height - h) // 2
+    region = canvas[y0:y0 + h, x0:x0 + w]
+    if mask is None:
+        region[:] = frame[..., :3]
+    else:
+        alpha = mask[..., None]
+        region[:] = (region * (1 - alpha) + frame[..., :3] * alpha).astype(np.uint8)
+    return canvas
 
 def resize_clip_to_aspect(clip: Any, target_width: int, target_height: int, bg_color: tuple = DEFAULT_BG_COLOR) -> Any:
     """Resizes a clip to fit the target aspect ratio, adding padding if needed."""
@@ -81,19 +238,11 @@ def resize_clip_to_aspect(clip: Any, target_width: int, target_height: int, bg_c
     clip_ratio = clip_w / clip_h
 
     if clip_ratio == target_ratio:
-        # If aspect ratios match, just resize
-        return clip.resize(width=target_width) # Resize based on width
+        # If aspect ratios match, just resize (unless ffmpeg already delivered the target size)
+        return clip if clip_w == target_width else _resize_clip(clip, (target_width, target_height))
     else:
         # Resize to fit within target dimensions while maintaining aspect ratio
-        if clip_ratio > target_ratio:
-            # Clip is wider than target: fit to width
-            scale_factor = target_width / clip_w
-        else:
-            # Clip is taller than target: fit to height
-            scale_factor = target_height / clip_h
-            
-        new_width = int(clip_w * scale_factor)
-        new_height = int(clip_h * scale_factor)
+        new_width, new_height = _fit_size(clip_w, clip_h, target_width, target_height)
         
         # Ensure duration is preserved for ImageClips without explicit duration
         clip_duration = clip.duration
@@ -101,21 +250,29 @@ def resize_clip_to_aspect(clip: Any, target_width: int, target_height: int, bg_c
              logging.warning("Clip has no duration, defaulting to 1s for resize background.")
              clip_duration = 1 # Default duration if none
              
-        resized_clip = clip.resize((new_width, new_height))
+        # Already at the fitted size when opened through _open_video_fitted
+        resized_clip = clip if (new_width, new_height) == (clip_w, clip_h) else _resize_clip(clip, (new_width, new_height))
         
-        # Create background clip
-        background = ColorClip(size=(target_width, target_height), color=bg_color, duration=clip_duration)
-        
-        # Composite the resized clip onto the background
-        # Use set_position('center') and set_duration on the final composite clip
-        final_clip = CompositeVideoClip([
-            background,
-            resized_clip.set_position('center')
-        ], size=(target_width, target_height))
-        
-        # Crucially, set the duration of the final composite clip
-        final_clip = final_clip.set_duration(clip_duration)
-        return final_clip
+        # Letterboxing done with a NumPy paste instead of a per-frame CompositeVideoClip blit
+        if isinstance(resized_clip, ImageClip):
+            # Still image: the padded frame is built once
+            mask_frame = resized_clip.mask.get_frame(0) if resized_clip.mask is not None else None
+            canvas = _letterbox_frame(resized_clip.get_frame(0), target_width, target_height, bg_color, mask_frame)
+            return _set_duration_inplace(ImageClip(canvas), clip_duration)
+
+        if resized_clip.mask is None:
+            final_clip = resized_clip.fl_image(lambda frame: _letterbox_frame(frame, target_width, target_height, bg_color))
+            return _set_duration_inplace(final_clip, clip_duration)
+
+        # Video with transparency: the mask frame at the same t drives the blend, so no
+        # ColorClip/CompositeVideoClip is needed. The padded result is opaque.
+        # (fl returns a new clip, so the attributes below are set in place.)
+        mask_clip = resized_clip.mask
+        final_clip = resized_clip.fl(
+            lambda get_frame, t: _letterbox_frame(get_frame(t), target_width, target_height, bg_color, mask_clip.get_frame(t))
+        )
+        final_clip.mask = None
+        return _set_duration_inplace(final_clip, clip_duration)
 
 def apply_ken_burns(image_clip: ImageClip, duration: float, zoom_factor: float = 1.15, direction="random") -> CompositeVideoClip:
     """Applies a subtle zoom (Ken Burns) effect to an ImageClip."""
@@ -143,6 +300,123 @@ def apply_ken_burns(image_clip: ImageClip, duration: float, zoom_factor: float =
     final_kb_clip = CompositeVideoClip([zoomed_clip], size=image_clip.size).set_duration(duration)
     return final_kb_clip
 
+def _write_scene_intermediate(clip: Any, path: Path) -> Path:
+    """Encode un clip de scène seul (sans audio) avec les paramètres communs à toutes les scènes."""
+    video_codec, video_ffmpeg_params = _video_encoder_settings()
+    clip.write_videofile(
+        str(path),
+        fps=30,
+        codec=video_codec,
+        ffmpeg_params=video_ffmpeg_params,
+        audio=False,
+        logger=None
+    )
+    return path
+
+def _concat_scene_files(scene_files: List[Path], audio_track_path: Path, output_path: Path, duration: float) -> None:
+    """
+    Assemble les scènes encodées avec le démultiplexeur concat de ffmpeg et ajoute la piste audio
+    déjà encodée, le tout en copie de flux. La sortie est coupée à la durée de la vidéo,
+    comme le faisait write_videofile.
+    """
+    manifest_path = scene_files[0].parent / "concat.txt"
+    # Guillemets simples échappés selon la syntaxe du manifeste concat
+    manifest_path.write_text(
+        "".join("file '{}'\n".format(path.resolve().as_posix().replace("'", "'\\''")) for path in scene_files),
+        encoding="utf-8"
+    )
+    try:
+        subprocess.run(
+            [get_setting("FFMPEG_BINARY"), "-y", "-hide_banner", "-loglevel", "error",
+             "-f", "concat", "-safe", "0", "-i", str(manifest_path),
+             "-i", str(audio_track_path),
+             "-map", "0:v:0", "-map", "1:a:0",
+             "-c", "copy",
+             "-t", f"{duration:.3f}",
+             str(output_path)],
+            capture_output=True, check=True
+        )
+    finally:
+        manifest_path.unlink(missing_ok=True)
+
+def _encode_audio_aac(audio_path: Path, audio_track_path: Path) -> None:
+    """Encode la voix off en AAC (.m4a) dans son propre processus ffmpeg."""
+    subprocess.run(
+        [get_setting("FFMPEG_BINARY"), "-y", "-hide_banner", "-loglevel", "error",
+         "-i", str(audio_path), "-vn", "-c:a", "aac", str(audio_track_path)],
+        capture_output=True, check=True
+    )
+
+def _mux_video_audio(video_path: Path, audio_track_path: Path, output_path: Path, duration: float) -> None:
+    """Réunit vidéo et audio déjà encodés sans réencodage, coupés à la durée de la vidéo."""
+    subprocess.run(
+        [get_setting("FFMPEG_BINARY"), "-y", "-hide_banner", "-loglevel", "error",
+         "-i", str(video_path), "-i", str(audio_track_path),
+         "-map", "0:v:0", "-map", "1:a:0",
+         "-c", "copy", "-t", f"{duration:.3f}",
+         str(output_path)],
+        capture_output=True, check=True
+    )
+
+def _write_video_threaded(clip: Any, output_path: Path, fps: int = 30) -> None:
+    """
+    Encode le clip (vidéo seule) en envoyant ses frames brutes sur l'entrée standard de ffmpeg.
+    Un thread calcule les frames pendant que le thread appelant les écrit dans le pipe :
+    le rendu Python et l'encodage se chevauchent au lieu d'alterner comme dans write_videofile.
+    """
+    width, height = clip.size
+    video_codec, video_ffmpeg_params = _video_encoder_settings()
+    cmd = [
+        get_setting("FFMPEG_BINARY"), "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "pipe:0",
+        "-c:v", video_codec, *(video_ffmpeg_params or ["-preset", "medium", "-pix_fmt", "yuv420p"]),
+        "-threads", str(os.cpu_count() or 2),
+        str(output_path)
+    ]
+    frames: queue.Queue = queue.Queue(maxsize=FRAME_QUEUE_SIZE)
+    stop = threading.Event()
+    producer_errors: List[Exception] = []
+
+    def _produce():
+        try:
+            for frame in clip.iter_frames(fps=fps, dtype="uint8", logger="bar"):
+                if stop.is_set():
+                    return
+                frames.put(frame)
+        except Exception as e:
+            producer_errors.append(e)
+        finally:
+            frames.put(None) # Fin du flux
+
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    producer = threading.Thread(target=_produce, name="frame-producer", daemon=True)
+    producer.start()
+    finished = False
+    try:
+        while True:
+            frame = frames.get()
+            if frame is None:
+                finished = True
+                break
+            proc.stdin.write(frame.tobytes())
+    finally:
+        # En cas d'échec d'écriture : arrêter le producteur et vider la file pour le débloquer
+        stop.set()
+        while not finished:
+            finished = frames.get() is None
+        producer.join()
+        try:
+            proc.stdin.close()
+        except OSError:
+            pass
+        stderr = proc.stderr.read()
+        proc.wait()
+
+    if producer_errors:
+        raise producer_errors[0]
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr)
+
 def compose_final_video(
     script_data: Dict[str, Any],
     project_dir: Path,
@@ -154,13 +428,12 @@ def compose_final_video(
     audio_path: Path, # Path to the final voiceover audio
     output_path: Path, # Path for the output video (no captions)
     target_aspect_ratio: tuple = TIKTOK_ASPECT_RATIO,
-    add_blurred_bg: bool = True # NOUVEAU: Option pour activer/désactiver le fond flouté
+    add_blurred_bg: bool = True, # NOUVEAU: Option pour activer/désactiver le fond flouté
+    use_ffmpeg_concat: bool = False # Scènes encodées en parallèle puis assemblées par ffmpeg (concat, -c copy)
 ) -> bool:
     """Composes the final video based on the script data and media assets."""
     
     target_w, target_h = target_aspect_ratio
-    video_clips = []
-    ai_image_index = 0 # To track which AI image to use sequentially
     scenes = script_data.get("scenes", [])
 
     if not scenes:
@@ -177,20 +450,48 @@ def compose_final_video(
         return False
         
     # --- Process Scenes --- 
-    current_video_duration = 0.0
-    error_occurred = False
+    ai_image_files = sorted(ai_images_dir.glob("*.jpeg")) # Listé une seule fois pour toutes les scènes ai_image
+
+    # L'index d'image IA dépend de l'ordre des scènes : il est attribué avant la préparation parallèle
+    valid_scenes = []
+    ai_indices = []
+    next_ai_index = 0
     for scene in scenes:
+        if not all([scene.get("scene_number"), scene.get("visual_type"), scene.get("duration_seconds")]):
+            logging.warning(f"Skipping scene due to missing data: {scene}")
+            continue
+        valid_scenes.append(scene)
+        ai_indices.append(next_ai_index)
+        if scene.get("visual_type") == "ai_image":
+            next_ai_index += 1
+
+    # Tous les clips ouverts (lecteurs ffmpeg) pendant la préparation, fermés une fois la vidéo écrite
+    opened_clips: List[Any] = []
+    # Fichiers bouclés par ffmpeg (intermediate/scene_<n>_loop.mp4), supprimés avec les autres intermédiaires
+    loop_files: List[Path] = []
+
+    # L'image produit peut servir à plusieurs scènes product_shot : décodée et mise au format une seule fois
+    product_frame_lock = threading.Lock()
+    product_frame: List[np.ndarray] = []
+
+    def _padded_product_frame(image_path: str) -> np.ndarray:
+        with product_frame_lock:
+            if not product_frame:
+                product_clip = _set_duration_inplace(ImageClip(image_path), 1)
+                product_frame.append(resize_clip_to_aspect(product_clip, target_w, target_h).get_frame(0))
+                close_clip(product_clip)
+            return product_frame[0]
+
+    def _prepare_scene(scene: Dict[str, Any], ai_image_index: int) -> Tuple[Any, bool]:
+        """Charge et met au format le média d'une scène. Retourne (clip, erreur survenue)."""
         scene_number = scene.get("scene_number")
         visual_type = scene.get("visual_type")
         duration_seconds = scene.get("duration_seconds")
-        
-        if not all([scene_number, visual_type, duration_seconds]):
-            logging.warning(f"Skipping scene due to missing data: {scene}")
-            continue
-            
+
         logging.info(f"Processing Scene {scene_number}: Type='{visual_type}', Duration={duration_seconds}s")
         scene_clip_raw = None # Clip original avant tout traitement majeur
         media_path_for_log = "N/A"
+        loop_path = project_dir / "intermediate" / f"scene_{scene_number}_loop.mp4" # Si le média doit être bouclé
         
         try:
             # --- Load Media --- 
@@ -200,7 +501,8 @@ def compose_final_video(
                     # Limit hook duration to avoid freezing on short hooks
                     MAX_HOOK_DURATION = 4.0 # Max seconds to take from hook video
                     try:
-                        full_hook_clip = VideoFileClip(media_path_for_log)
+                        full_hook_clip = _open_video_fitted(media_path_for_log, target_w, target_h)
+                        opened_clips.append(full_hook_clip)
                         actual_hook_duration = full_hook_clip.duration
                         target_duration = min(duration_seconds, actual_hook_duration, MAX_HOOK_DURATION)
                         scene_clip_raw = full_hook_clip.subclip(0, target_duration)
@@ -215,12 +517,10 @@ def compose_final_video(
             elif visual_type == "ai_image":
                 # Find the next available AI image sequentially based on scene order of type 'ai_image'
                 # Assumes image_generator saved them as 1.jpeg, 2.jpeg etc. IN THE ORDER of ai_image scenes
-                ai_image_files = sorted(ai_images_dir.glob("*.jpeg"))
                 if ai_image_index < len(ai_image_files):
                     media_path_for_log = str(ai_image_files[ai_image_index])
                     logging.info(f"Scene {scene_number}: Using AI image {media_path_for_log}")
-                    scene_clip_raw = ImageClip(media_path_for_log).set_duration(duration_seconds)
-                    ai_image_index += 1
+                    scene_clip_raw = _set_duration_inplace(ImageClip(media_path_for_log), duration_seconds)
                 else:
                      logging.warning(f"Scene {scene_number}: No more AI images found in {ai_images_dir} (expected index {ai_image_index}). Using black screen.")
                      
@@ -229,12 +529,14 @@ def compose_final_video(
                 if video_paths:
                     media_path_for_log = random.choice(video_paths)
                     logging.info(f"Scene {scene_number}: Using stock video {Path(media_path_for_log).name}")
-                    temp_clip = VideoFileClip(media_path_for_log)
+                    temp_clip = _open_video_fitted(media_path_for_log, target_w, target_h)
+                    opened_clips.append(temp_clip)
                     if temp_clip.duration >= duration_seconds:
                          scene_clip_raw = temp_clip.subclip(0, duration_seconds)
                     else:
                          logging.warning(f"Scene {scene_number}: Stock video duration ({temp_clip.duration:.2f}s) is shorter than required ({duration_seconds}s). Looping.")
-                         scene_clip_raw = temp_clip.loop(duration=duration_seconds)
+                         loop_files.append(loop_path)
+                         scene_clip_raw = _loop_video(temp_clip, media_path_for_log, duration_seconds, loop_path, target_w, target_h)
                     if scene_clip_raw: scene_clip_raw = scene_clip_raw.without_audio()
                 else:
                     logging.warning(f"Scene {scene_number}: No downloaded stock videos found for this scene type. Using black screen.")
@@ -242,7 +544,8 @@ def compose_final_video(
             elif visual_type == "product_shot":
                 if product_image_path and Path(product_image_path).is_file():
                     media_path_for_log = product_image_path
-                    scene_clip_raw = ImageClip(media_path_for_log).set_duration(duration_seconds)
+                    # Already at the target size: resize_clip_to_aspect below returns it unchanged
+                    scene_clip_raw = _set_duration_inplace(ImageClip(_padded_product_frame(product_image_path)), duration_seconds)
                 else:
                     logging.warning(f"Scene {scene_number}: Product image not found or invalid for type '{visual_type}'. Using black screen.")
 
@@ -251,12 +554,14 @@ def compose_final_video(
                     media_path_for_log = main_product_video_path
                     logging.info(f"Scene {scene_number}: Using main product video {media_path_for_log}")
                     try:
-                        temp_clip = VideoFileClip(media_path_for_log)
+                        temp_clip = _open_video_fitted(media_path_for_log, target_w, target_h)
+                        opened_clips.append(temp_clip)
                         if temp_clip.duration >= duration_seconds:
                             scene_clip_raw = temp_clip.subclip(0, duration_seconds)
                         else:
                             logging.warning(f"Scene {scene_number}: Main product video '{Path(main_product_video_path).name}' duration ({temp_clip.duration:.2f}s) is shorter than required ({duration_seconds}s). Looping.")
-                            scene_clip_raw = temp_clip.loop(duration=duration_seconds)
+                            loop_files.append(loop_path)
+                            scene_clip_raw = _loop_video(temp_clip, media_path_for_log, duration_seconds, loop_path, target_w, target_h)
                         if scene_clip_raw: 
                             scene_clip_raw = scene_clip_raw.without_audio()
                     except Exception as e:
@@ -274,14 +579,13 @@ def compose_final_video(
                 logging.debug(f"Scene {scene_number}: Created placeholder ColorClip.")
             
             # --- Ensure Clip Duration and Resize --- 
-            # Force duration just in case
-            scene_clip_raw = scene_clip_raw.set_duration(duration_seconds)
+            # Force duration just in case (every branch built a fresh clip for this scene)
+            scene_clip_raw = _set_duration_inplace(scene_clip_raw, duration_seconds)
             
             # Resize to target aspect ratio
             processed_clip = resize_clip_to_aspect(scene_clip_raw, target_w, target_h)
-            video_clips.append(processed_clip)
-            current_video_duration += duration_seconds
             logging.debug(f"Scene {scene_number}: Processed. Clip duration: {processed_clip.duration:.2f}s")
+            return processed_clip, False
 
         except Exception as e:
             logging.error(f"Error processing Scene {scene_number} (Media: {media_path_for_log}): {e}", exc_info=True)
@@ -289,27 +593,66 @@ def compose_final_video(
             error_clip = ColorClip(size=(target_w, target_h), color=(255,0,0), duration=duration_seconds) # Red screen for error
             error_text = TextClip(f"Error\nScene {scene_number}", fontsize=50, color='white').set_duration(duration_seconds).set_position('center')
             processed_clip = CompositeVideoClip([error_clip, error_text], size=(target_w, target_h)).set_duration(duration_seconds)
-            video_clips.append(processed_clip)
-            current_video_duration += duration_seconds
-            error_occurred = True # Mark that an error happened
-            # continue # Continue to next scene
+            return processed_clip, True # Mark that an error happened
             
         finally:
-             # Clean up temporary clips to free memory? 
-             # Check if clip needs closing: clip.close() (especially VideoFileClip)
-             if isinstance(scene_clip_raw, (VideoFileClip, ImageClip)): 
-                 try: scene_clip_raw.close() 
-                 except: pass 
+             # The readers are still needed to render the frames: they are closed after the final write
+             if scene_clip_raw is not None:
+                 opened_clips.append(scene_clip_raw)
+
+    # Ouverture des médias (sous-processus ffmpeg) et redimensionnements en parallèle ;
+    # map conserve l'ordre du script.
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 2) as executor:
+        prepared = list(executor.map(_prepare_scene, valid_scenes, ai_indices))
+    video_clips = [_conform_clip(clip, target_w, target_h) for clip, _ in prepared]
+    error_occurred = any(had_error for _, had_error in prepared)
+    current_video_duration = float(sum(scene["duration_seconds"] for scene in valid_scenes))
 
     # --- Concatenate and Add Audio --- 
     if not video_clips:
         logging.error("No video clips were processed. Cannot create final video.")
         return False
         
+    # La voix off est encodée en AAC pendant le rendu vidéo, puis muxée en copie de flux
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    audio_track_path = output_path.with_name(f"{output_path.stem}_audio.m4a")
+    audio_executor = ThreadPoolExecutor(max_workers=1)
+    audio_future = audio_executor.submit(_encode_audio_aac, audio_path, audio_track_path)
+    audio_executor.shutdown(wait=False) # Pas d'attente ici : l'encodage tourne pendant le rendu
+
+    if use_ffmpeg_concat:
+        scenes_dir = project_dir / "intermediate"
+        scenes_dir.mkdir(parents=True, exist_ok=True)
+        scene_files = [scenes_dir / f"scene_{index:03d}.mp4" for index in range(len(video_clips))]
+        try:
+            logging.info(f"Encoding {len(video_clips)} scenes separately for ffmpeg concat. Target duration: {current_video_duration:.2f}s")
+            with ThreadPoolExecutor(max_workers=CONCAT_ENCODE_WORKERS) as executor:
+                list(executor.map(_write_scene_intermediate, video_clips, scene_files))
+            audio_future.result()
+            _concat_scene_files(scene_files, audio_track_path, output_path, current_video_duration)
+            logging.info(f"✅ Final video (no captions) saved to: {output_path}")
+            return True
+        except subprocess.CalledProcessError as e:
+            logging.error(f"ffmpeg concat failed: {e.stderr.decode(errors='replace').strip()}")
+            return False
+        except Exception as e:
+            logging.error(f"Failed during final video composition or writing: {e}", exc_info=True)
+            return False
+        finally:
+            for clip in video_clips + opened_clips:
+                close_clip(clip)
+            close_clip(main_audio_clip)
+            for scene_file in scene_files + loop_files:
+                scene_file.unlink(missing_ok=True)
+            audio_future.exception() # Attendre la fin de l'encodage audio avant de supprimer sa sortie
+            audio_track_path.unlink(missing_ok=True)
+
+    video_only_path = output_path.with_name(f"{output_path.stem}_video.mp4")
+    final_video_track = None
     try:
         logging.info(f"Concatenating {len(video_clips)} clips. Target duration: {current_video_duration:.2f}s")
-        final_video_track = concatenate_videoclips(video_clips, method="compose")
-        final_video_track = final_video_track.set_fps(30) # Set FPS
+        final_video_track = concatenate_videoclips(video_clips, method="chain") # Clips conformes : pas de composite par frame
+        final_video_track.fps = 30 # Set FPS (the concatenated clip is ours, no copy needed)
         
         # Adjust audio to match final video duration
         final_duration = final_video_track.duration
@@ -318,30 +661,35 @@ def compose_final_video(
         if abs(final_duration - total_audio_duration) > 0.5:
              logging.warning(f"Video duration ({final_duration:.2f}s) differs significantly from audio duration ({total_audio_duration:.2f}s). Audio will be truncated by video length during write.")
 
-        # Set the original main audio clip; moviepy should handle duration matching during write
-        final_video = final_video_track.set_audio(main_audio_clip) 
-        
         # --- Write Video File --- 
+        # Video-only encode while the AAC track is produced in parallel, then a stream-copy mux
+        # that cuts the audio to the video length
         logging.info(f"Writing final video (no captions) to: {output_path}...")
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        final_video.write_videofile(
-            str(output_path),
-            fps=30,
-            codec="libx264",
-            audio_codec="aac",
-            threads=os.cpu_count() or 2, # Use available cores
-            logger='bar' # Show progress bar
-        )
+        logging.info(f"Video encoder: {_video_encoder_settings()[0]}")
+        _write_video_threaded(final_video_track, video_only_path, fps=30)
+        audio_future.result()
+        _mux_video_audio(video_only_path, audio_track_path, output_path, final_duration)
         
-        # --- Clean Up --- 
-        close_clip(final_video)
         # Log success using logging.info instead of logging.success
         logging.info(f"✅ Final video (no captions) saved to: {output_path}")
         return True
 
+    except subprocess.CalledProcessError as e:
+        logging.error(f"ffmpeg failed while writing the final video: {e.stderr.decode(errors='replace').strip()}")
+        return False
     except Exception as e:
         logging.error(f"Failed during final video composition or writing: {e}", exc_info=True)
         return False
+    finally:
+        # --- Clean Up --- 
+        for clip in [final_video_track, *video_clips, *opened_clips]:
+            close_clip(clip)
+        close_clip(main_audio_clip)
+        video_only_path.unlink(missing_ok=True)
+        for loop_file in loop_files:
+            loop_file.unlink(missing_ok=True)
+        audio_future.exception() # Attendre la fin de l'encodage audio avant de supprimer sa sortie
+        audio_track_path.unlink(missing_ok=True)
 
 
 # Remove old functions
@@ -1,16 +1,29 @@
 import asyncio
+import functools
+import hashlib
+import json
 import os
+import queue
+import random
 import re
-from datetime import datetime
-from typing import Union, List, Dict
+import shutil
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union, List, Dict, Tuple
 from xml.sax.saxutils import unescape
 from pathlib import Path # Use Path for paths
 
 import edge_tts
+import numpy as np
 from edge_tts import SubMaker, submaker
-from edge_tts.submaker import mktimestamp
 from loguru import logger
-from moviepy.video.tools import subtitles as moviepy_subtitles # Alias to avoid conflict
+
+try:
+    import azure.cognitiveservices.speech as speechsdk # Optional: only needed for V2 voices
+except ImportError:
+    speechsdk = None
 
 # Import the new config loader
 from .config_loader import get_azure_speech_key, get_azure_speech_region
@@ -21,21 +34,34 @@ from .config_loader import get_azure_speech_key, get_azure_speech_region
 # Remove app.utils dependency - reimplement or remove functions needed
 # from app.utils import utils 
 
+# Compiled once at import instead of on every call
+_PUNCT_SET = frozenset(",.!?。，、？！；：") # Test du dernier caractère en O(1)
+_SPLIT_RE = re.compile(r'([,.!?。，、？！；：])\s*')
+_BRACKET_TRANS = str.maketrans({c: ' ' for c in '()[]{}'})
+_SENTENCE_END_RE = re.compile(r'[.!?。！？]\s+') # Fin de phrase suivie d'un blanc : pas de coupure dans 3,5 ou www.site.com
+_SRT_BLOCK_RE = re.compile(r'\d+\n\d\d:\d\d:\d\d,\d{3} --> \d\d:\d\d:\d\d,\d{3}\n.+\n', re.DOTALL)
+_VOICE_RE = re.compile(r"Name:\s*(.+)\s*Gender:\s*(.+)\s*", re.MULTILINE)
+
 # Basic utility function replacement (if needed)
 def split_string_by_punctuations(s: str) -> list[str]:
     """Splits a string by common punctuations, keeping the punctuation with the preceding part."""
     if not s:
         return []
     # Enhanced regex to handle various punctuation and keep them temporarily marked
-    s = re.sub(r'([,.!?。，、？！；：])\s*', r'\1<SPLIT>', s)
+    s = _SPLIT_RE.sub(r'\1<SPLIT>', s)
     parts = [part.strip() for part in s.split('<SPLIT>') if part.strip()]
     return parts
 
 # --- Azure Voices (Keep as is, no config dependency) --- 
 def get_all_azure_voices(filter_locals=None) -> list[str]:
-    # ... (existing code for voices_str and parsing)
     if filter_locals is None:
         filter_locals = ["fr-FR", "en-US", "es-ES"] # Defaulting to FR/EN/ES
+    # Parsed once per filter; a fresh list is returned so callers can't alter the cached result
+    return list(_azure_voices(tuple(filter_locals)))
+
+@functools.lru_cache(maxsize=16)
+def _azure_voices(filter_locals: tuple) -> tuple:
+    # ... (existing code for voices_str and parsing)
     voices_str = """ 
     Name: af-ZA-AdriNeural
     Gender: Female
@@ -47,8 +73,7 @@ def get_all_azure_voices(filter_locals=None) -> list[str]:
     """
     # ... (rest of the parsing logic)
     voices = []
-    pattern = re.compile(r"Name:\s*(.+)\s*Gender:\s*(.+)\s*", re.MULTILINE)
-    matches = pattern.findall(voices_str)
+    matches = _VOICE_RE.findall(voices_str)
     for name, gender in matches:
         if filter_locals and any(
             name.lower().startswith(fl.lower()) for fl in filter_locals
@@ -57,19 +82,29 @@ def get_all_azure_voices(filter_locals=None) -> list[str]:
         elif not filter_locals:
             voices.append(f"{name}-{gender}")
     voices.sort()
-    return voices
+    return tuple(voices)
     
+@functools.lru_cache(maxsize=256)
 def parse_voice_name(name: str):
     # ... (existing code)
     name = name.replace("-Female", "").replace("-Male", "").strip()
     return name
 
+@functools.lru_cache(maxsize=256)
 def is_azure_v2_voice(voice_name: str):
     # ... (existing code)
     voice_name = parse_voice_name(voice_name)
     if voice_name.endswith("-V2"):
-        return voice_name.replace("-V2", "").strip()
+        return voice_name.removesuffix("-V2").strip()
     return ""
+
+@functools.lru_cache(maxsize=256)
+def _classify_voice(voice_name: str) -> Tuple[str, bool]:
+    """(base voice name, is V2) parsed once, so the engines don't parse the name again."""
+    v2_base_name = is_azure_v2_voice(voice_name)
+    if v2_base_name:
+        return v2_base_name, True
+    return parse_voice_name(voice_name), False
 # --- End Azure Voices ---
 
 
@@ -77,14 +112,57 @@ def tts(
     text: str, 
     voice_name: str, 
     voice_rate: float, # Rate for v1 only
-    voice_file: Path # Expect Path object
+    voice_file: Path, # Expect Path object
+    cache_dir: Path | None = None # Reuse audio + word timings of identical (text, voice, rate) requests
 ) -> Union[SubMaker, None]:
     """Generates TTS audio using Azure V1 (edge-tts) or V2 (SDK)."""
     voice_file_str = str(voice_file)
-    if is_azure_v2_voice(voice_name):
+    cache_key = _tts_cache_key(text, voice_name, voice_rate) if cache_dir else None
+    if cache_key:
+        sub_maker = _load_cached_tts(cache_dir, cache_key, voice_file_str)
+        if sub_maker:
+            logger.info(f"TTS cache hit ({cache_key}): {voice_file_str}")
+            return sub_maker
+
+    voice_name_base, is_v2 = _classify_voice(voice_name)
+    if is_v2:
         # V2 doesn't use rate parameter in this implementation
-        return azure_tts_v2(text, voice_name, voice_file_str) 
-    return azure_tts_v1(text, voice_name, voice_rate, voice_file_str)
+        sub_maker = _azure_tts_v2(text, voice_name_base, voice_file_str) 
+    else:
+        sub_maker = _run_async(_azure_tts_v1_with_retries(text, voice_name_base, voice_rate, voice_file_str))
+
+    if cache_key and sub_maker:
+        _store_cached_tts(cache_dir, cache_key, voice_file_str, sub_maker)
+    return sub_maker
+
+def _tts_cache_key(text: str, voice_name: str, voice_rate: float) -> str:
+    return hashlib.blake2b(f"{voice_name}|{voice_rate}|{text}".encode("utf-8"), digest_size=16).hexdigest()
+
+def _load_cached_tts(cache_dir: Path, cache_key: str, voice_file: str) -> Union[SubMaker, None]:
+    """Copies the cached mp3 to voice_file and rebuilds its SubMaker; None on a miss."""
+    audio_path = cache_dir / f"{cache_key}.mp3"
+    subs_path = cache_dir / f"{cache_key}.subs.json"
+    try:
+        cached = json.loads(subs_path.read_bytes())
+        sub_maker = SubMaker()
+        sub_maker.subs = cached["subs"]
+        sub_maker.offset = [tuple(offset) for offset in cached["offset"]]
+        shutil.copyfile(audio_path, voice_file)
+    except (OSError, ValueError, KeyError, TypeError): # Entrée absente ou mal formée : resynthétisée
+        return None
+    return sub_maker
+
+def _store_cached_tts(cache_dir: Path, cache_key: str, voice_file: str, sub_maker: SubMaker) -> None:
+    """Saves the audio and word timings; the timings file is written last so it marks a complete entry."""
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(voice_file, cache_dir / f"{cache_key}.mp3")
+        subs_path = cache_dir / f"{cache_key}.subs.json"
+        tmp_path = subs_path.with_name(subs_path.name + ".tmp")
+        tmp_path.write_text(json.dumps({"subs": sub_maker.subs, "offset": sub_maker.offset}, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, subs_path)
+    except OSError as e:
+        logger.warning(f"Could not store TTS result in cache {cache_dir}: {e}")
 
 
 def convert_rate_to_percent(rate: float) -> str:
@@ -97,38 +175,74 @@ def convert_rate_to_percent(rate: float) -> str:
     else:
         return f"{percent}%"
 
+TTS_MAX_CONCURRENCY = 8 # Simultaneous edge-tts streams in batch mode (service rate limits)
+AUDIO_FLUSH_BYTES = 1 << 18 # Audio buffered in memory before each disk write (256 KB: most clips need one write)
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the persistent event loop used for edge-tts, started on first use.
+    It runs forever in a daemon thread, so callers that already run inside an
+    event loop (e.g. Streamlit) can still submit coroutines to it.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="edge-tts-loop", daemon=True).start()
+        return _loop
+
+def _run_async(coro):
+    """Runs a coroutine on the persistent loop and blocks until its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
 async def _azure_tts_v1_async(
     text: str, voice_name: str, rate_str: str, voice_file: str
 ) -> SubMaker:
-    """Async helper for edge-tts V1 generation."""
+    """
+    Async helper for edge-tts V1 generation.
+    Audio chunks are buffered and flushed to disk in the default executor so the
+    event loop (shared with other streams) never blocks on file writes.
+    """
     communicate = edge_tts.Communicate(text, voice_name, rate=rate_str)
     sub_maker = edge_tts.SubMaker()
+    loop = asyncio.get_running_loop()
+    word_boundaries = [] # (offset, duration, text), turned into subs once the stream is done
+    buffer = bytearray()
     with open(voice_file, "wb") as file:
         async for chunk in communicate.stream():
             if chunk["type"] == "audio":
-                file.write(chunk["data"])
+                buffer += chunk["data"]
+                if len(buffer) >= AUDIO_FLUSH_BYTES:
+                    # The write completes before the buffer is reused, so no bytes() copy is needed
+                    await loop.run_in_executor(None, file.write, buffer)
+                    buffer.clear()
             elif chunk["type"] == "WordBoundary":
-                sub_maker.create_sub(
-                    (chunk["offset"], chunk["duration"]), chunk["text"]
-                )
+                word_boundaries.append((chunk["offset"], chunk["duration"], chunk["text"]))
+        if buffer:
+            await loop.run_in_executor(None, file.write, buffer)
+    for offset, duration, word in word_boundaries:
+        sub_maker.create_sub((offset, duration), word)
     return sub_maker
 
-def azure_tts_v1(
+async def _azure_tts_v1_with_retries(
     text: str, voice_name: str, voice_rate: float, voice_file: str
 ) -> Union[SubMaker, None]:
-    voice_name = parse_voice_name(voice_name)
+    """Retry loop for edge-tts; voice_name is the already parsed base name."""
     text = text.strip()
     rate_str = convert_rate_to_percent(voice_rate)
     for i in range(3): # Retry logic
         try:
             logger.info(f"Starting Azure TTS V1 (edge-tts): voice={voice_name}, rate={rate_str}, try={i + 1}")
             
-            sub_maker = asyncio.run(_azure_tts_v1_async(text, voice_name, rate_str, voice_file))
+            sub_maker = await _azure_tts_v1_async(text, voice_name, rate_str, voice_file)
 
             if not sub_maker or not sub_maker.subs:
                 logger.warning("Azure TTS V1 failed: SubMaker empty or invalid.")
                 # Optional: Add a small delay before retrying
-                # asyncio.run(asyncio.sleep(1))
+                # await asyncio.sleep(1)
                 continue
 
             logger.info(f"Azure TTS V1 completed: {voice_file}")
@@ -136,11 +250,98 @@ def azure_tts_v1(
         except Exception as e:
             logger.error(f"Azure TTS V1 failed on try {i+1}: {e}")
             # Optional: Add a small delay before retrying
-            # asyncio.run(asyncio.sleep(1))
+            # await asyncio.sleep(1)
             
     logger.error(f"Azure TTS V1 failed after multiple retries for: {voice_file}")
     return None
 
+def azure_tts_v1(
+    text: str, voice_name: str, voice_rate: float, voice_file: str
+) -> Union[SubMaker, None]:
+    return _run_async(_azure_tts_v1_with_retries(text, parse_voice_name(voice_name), voice_rate, voice_file))
+
+async def azure_tts_v1_many(
+    items: List[Tuple[str, str, float, Path]], max_concurrency: int = TTS_MAX_CONCURRENCY
+) -> List[Union[SubMaker, None]]:
+    """
+    Synthesizes several (text, voice_name, voice_rate, voice_file) items concurrently.
+    Results are in the order of items, None for an item that failed.
+    The semaphore keeps the number of open edge-tts websockets within the service limits.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _synthesize(text: str, voice_name: str, voice_rate: float, voice_file: Path):
+        async with semaphore:
+            return await _azure_tts_v1_with_retries(text, parse_voice_name(voice_name), voice_rate, str(voice_file))
+
+    results = await asyncio.gather(*(_synthesize(*item) for item in items), return_exceptions=True)
+    sub_makers = []
+    for (_, _, _, voice_file), result in zip(items, results):
+        if isinstance(result, BaseException):
+            logger.error(f"Azure TTS V1 batch item failed for {voice_file}: {result}")
+            result = None
+        sub_makers.append(result)
+    return sub_makers
+
+def azure_tts_v1_batch(
+    items: List[Tuple[str, str, float, Path]], max_concurrency: int = TTS_MAX_CONCURRENCY
+) -> List[Union[SubMaker, None]]:
+    """Blocking wrapper around azure_tts_v1_many, run on the persistent event loop."""
+    return _run_async(azure_tts_v1_many(items, max_concurrency))
+
+
+V2_CHUNK_CHARS = 400 # Longer texts are split at sentence ends into chunks of about this size
+V2_MAX_PARALLEL_CHUNKS = 4 # Chunks synthesized at the same time (one pooled synthesizer each)
+V2_SYNTHESIZER_TTL = 300 # Seconds a pooled Azure synthesizer (and its open connection) is reused
+V2_SYNTHESIZER_TTL_JITTER = 30 # Spread expiries so pooled synthesizers don't all reconnect together
+
+_v2_pool: Dict[str, queue.Queue] = {} # voice -> Queue of (SpeechSynthesizer, expires_at)
+_v2_pool_lock = threading.Lock()
+
+def _acquire_v2_synthesizer(voice_name_base: str, speech_key: str, service_region: str):
+    """
+    Returns (synthesizer, expires_at) for the voice: a pooled one whose connection is
+    still warm if available, otherwise a new one with its connection opened up front.
+    Audio is not bound to a file (audio_config=None) so the synthesizer can be reused;
+    it comes back in result.audio_data.
+    """
+    with _v2_pool_lock:
+        pool = _v2_pool.setdefault(voice_name_base, queue.Queue())
+    while True:
+        try:
+            synthesizer, expires_at = pool.get_nowait()
+        except queue.Empty:
+            break
+        if time.monotonic() < expires_at:
+            return synthesizer, expires_at
+
+    speech_config = speechsdk.SpeechConfig(subscription=speech_key, region=service_region)
+    # Use the original full voice name (including -V2-Gender) for configuration if needed by SDK
+    # Let's stick to the base name as per typical usage examples
+    speech_config.speech_synthesis_voice_name = voice_name_base 
+    speech_config.set_property(
+        property_id=speechsdk.PropertyId.SpeechServiceResponse_RequestWordBoundary,
+        value="true",
+    )
+    # High quality MP3 format
+    speech_config.set_speech_synthesis_output_format(
+        speechsdk.SpeechSynthesisOutputFormat.Audio48Khz192KBitRateMonoMp3
+    )
+    synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+    try:
+        # Pre-connect so the TLS + websocket handshake is not paid by the first synthesis
+        speechsdk.Connection.from_speech_synthesizer(synthesizer).open(True)
+    except Exception as e:
+        logger.warning(f"Could not pre-open Azure V2 connection: {e}")
+    expires_at = time.monotonic() + V2_SYNTHESIZER_TTL + random.uniform(-V2_SYNTHESIZER_TTL_JITTER, V2_SYNTHESIZER_TTL_JITTER)
+    return synthesizer, expires_at
+
+def _release_v2_synthesizer(voice_name_base: str, synthesizer, expires_at: float) -> None:
+    """Puts a healthy synthesizer back in its voice pool for the next call."""
+    synthesizer.synthesis_word_boundary.disconnect_all()
+    with _v2_pool_lock:
+        pool = _v2_pool.setdefault(voice_name_base, queue.Queue())
+    pool.put((synthesizer, expires_at))
 
 def azure_tts_v2(text: str, voice_name: str, voice_file: str) -> Union[SubMaker, None]:
     voice_name_base = is_azure_v2_voice(voice_name) # Get base name like zh-CN-XiaoxiaoMultilingualNeural
@@ -148,7 +349,10 @@ def azure_tts_v2(text: str, voice_name: str, voice_file: str) -> Union[SubMaker,
         msg = f"Invalid Azure V2 voice name format: {voice_name}"
         logger.error(msg)
         raise ValueError(msg)
-        
+    return _azure_tts_v2(text, voice_name_base, voice_file)
+
+def _azure_tts_v2(text: str, voice_name_base: str, voice_file: str) -> Union[SubMaker, None]:
+    """Azure SDK synthesis; voice_name_base is the already parsed name without -V2."""
     text = text.strip()
 
     speech_key = get_azure_speech_key()
@@ -158,114 +362,149 @@ def azure_tts_v2(text: str, voice_name: str, voice_file: str) -> Union[SubMaker,
         logger.error("Azure Speech Key or Region not configured in my_config.json")
         return None
 
-    try:
-        import azure.cognitiveservices.speech as speechsdk
-    except ImportError:
+    if speechsdk is None:
         logger.error("Azure Speech SDK not installed. Please install with: pip install azure-cognitiveservices-speech")
         return None
 
-    def _format_duration_to_offset(duration) -> int:
-        # ... (existing code)
-        if isinstance(duration, str):
-            try:
-                 time_obj = datetime.strptime(duration, "%H:%M:%S.%f")
-                 milliseconds = (
-                    (time_obj.hour * 3600000)
-                    + (time_obj.minute * 60000)
-                    + (time_obj.second * 1000)
-                    + (time_obj.microsecond // 1000)
-                 )
-                 return milliseconds * 10000 # Convert ms to 100ns ticks
-            except ValueError:
-                 logger.warning(f"Could not parse duration string: {duration}")
-                 return 0
-        elif isinstance(duration, int):
-             return duration # Assume it's already in 100ns ticks if int
-        return 0
+    chunks = _chunk_text(text, V2_CHUNK_CHARS)
+    if not chunks:
+        logger.error("Azure TTS V2: nothing to synthesize.")
+        return None
+
+    # Chunks are synthesized concurrently on pooled synthesizers; a failed chunk is retried alone
+    with ThreadPoolExecutor(max_workers=min(V2_MAX_PARALLEL_CHUNKS, len(chunks))) as executor:
+        results = list(executor.map(
+            lambda chunk: _synthesize_v2_chunk(chunk, voice_name_base, speech_key, service_region),
+            chunks
+        ))
+    if any(result is None for result in results):
+        logger.error(f"Azure TTS V2 failed after multiple retries for: {voice_file}")
+        return None
 
+    # Chunk audio is concatenated in order (MP3 frames can be appended as is) and
+    # word times are shifted by the audio duration of the preceding chunks
+    sub_maker = SubMaker()
+    cumulative_audio_ticks = 0
+    for _, audio_ticks, word_boundary_data in results:
+        for start_offset, duration, word in word_boundary_data:
+            sub_maker.create_sub((cumulative_audio_ticks + start_offset, duration), word)
+        cumulative_audio_ticks += audio_ticks
+    Path(voice_file).write_bytes(b"".join(audio_data for audio_data, _, _ in results))
+    logger.success(f"Azure V2 speech synthesis succeeded: {voice_file} ({len(chunks)} chunk(s))")
+
+    if not sub_maker.subs:
+        logger.warning("Azure TTS V2 succeeded but no word boundaries captured.")
+        # Let's return None as subtitles won't work.
+        return None
+    return sub_maker
+
+def _chunk_text(text: str, max_chars: int) -> List[str]:
+    """
+    Groups the sentences of text into chunks of at most ~max_chars (a longer sentence stays whole).
+    Text is cut only after a sentence end followed by whitespace and never altered:
+    "".join(chunks) == text. Text that fits in one chunk is returned as is.
+    """
+    if len(text) <= max_chars:
+        return [text] if text else []
+    cuts = [match.end() for match in _SENTENCE_END_RE.finditer(text)]
+    sentences = [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)]) if end > start]
+    chunks = []
+    current = ""
+    for sentence in sentences:
+        if current and len(current) + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current += sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _synthesize_v2_chunk(
+    text: str, voice_name_base: str, speech_key: str, service_region: str
+) -> Union[Tuple[bytes, int, List[Tuple[int, int, str]]], None]:
+    """
+    Synthesizes one chunk with retries.
+    Returns (mp3 bytes, audio duration in 100ns ticks, word boundaries) or None.
+    """
     for i in range(3): # Retry logic
         try:
-            logger.info(f"Starting Azure TTS V2 (SDK): voice={voice_name_base}, try={i + 1}")
-            sub_maker = SubMaker() # Reset sub_maker for each retry
-            word_boundary_data = [] # Store word boundary events temporarily
+            logger.info(f"Starting Azure TTS V2 (SDK): voice={voice_name_base}, chars={len(text)}, try={i + 1}")
+            word_boundary_data = [] # (offset, duration, text) tuples, all times in 100ns ticks
 
             def speech_synthesizer_word_boundary_cb(evt: speechsdk.SpeechEventArgs):
                 # Store event data instead of directly modifying sub_maker here
-                word_boundary_data.append({
-                    'offset': evt.audio_offset, # Already in 100ns ticks
-                    'duration': evt.duration.total_seconds() * 1_000_000_0, # Convert timedelta to 100ns ticks
-                    'text': evt.text
-                })
-
-            speech_config = speechsdk.SpeechConfig(subscription=speech_key, region=service_region)
-            # Use the original full voice name (including -V2-Gender) for configuration if needed by SDK
-            # Let's stick to the base name as per typical usage examples
-            speech_config.speech_synthesis_voice_name = voice_name_base 
-            speech_config.set_property(
-                property_id=speechsdk.PropertyId.SpeechServiceResponse_RequestWordBoundary,
-                value="true",
-            )
-            # High quality MP3 format
-            speech_config.set_speech_synthesis_output_format(
-                speechsdk.SpeechSynthesisOutputFormat.Audio48Khz192KBitRateMonoMp3
-            )
-
-            # Configure audio output
-            audio_config = speechsdk.audio.AudioOutputConfig(filename=voice_file)
+                # (audio_offset is already in ticks; the timedelta duration is converted)
+                word_boundary_data.append((evt.audio_offset, int(evt.duration.total_seconds() * 10_000_000), evt.text))
 
-            speech_synthesizer = speechsdk.SpeechSynthesizer(
-                speech_config=speech_config, audio_config=audio_config
-            )
-            
-            # Connect the event handler
-            speech_synthesizer.synthesis_word_boundary.connect(speech_synthesizer_word_boundary_cb)
-
-            # Synthesize the text
-            result = speech_synthesizer.speak_text_async(text).get()
-
-            # Check the result
-            if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-                logger.success(f"Azure V2 speech synthesis succeeded: {voice_file}")
-                # Process stored word boundary data *after* synthesis is complete
-                for word_data in word_boundary_data:
-                    start_offset = word_data['offset']
-                    end_offset = start_offset + word_data['duration']
-                    sub_maker.create_sub((start_offset, end_offset), word_data['text'])
-                    
-                if not sub_maker or not sub_maker.subs:
-                     logger.warning("Azure TTS V2 succeeded but no word boundaries captured.")
-                     # Still return None or an empty SubMaker?
-                     # Let's return None as subtitles won't work.
-                     return None 
-                return sub_maker 
-            elif result.reason == speechsdk.ResultReason.Canceled:
-                cancellation_details = result.cancellation_details
-                logger.error(f"Azure V2 speech synthesis canceled: {cancellation_details.reason}")
-                if cancellation_details.reason == speechsdk.CancellationReason.Error:
-                    logger.error(f"Azure V2 error details: {cancellation_details.error_details}")
-                # Retry if possible
-            else:
-                logger.error(f"Azure V2 synthesis failed with unexpected reason: {result.reason}")
+            speech_synthesizer, expires_at = _acquire_v2_synthesizer(voice_name_base, speech_key, service_region)
+            reusable = False # Only synthesizers that did not hit a service error go back to the pool
+            try:
+                # Connect the event handler
+                speech_synthesizer.synthesis_word_boundary.connect(speech_synthesizer_word_boundary_cb)
+
+                # Synthesize the text
+                result = speech_synthesizer.speak_text_async(text).get()
+
+                # Check the result
+                if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
+                    reusable = True
+                    audio_ticks = int(result.audio_duration.total_seconds() * 10_000_000)
+                    return result.audio_data, audio_ticks, word_boundary_data
+                elif result.reason == speechsdk.ResultReason.Canceled:
+                    cancellation_details = result.cancellation_details
+                    logger.error(f"Azure V2 speech synthesis canceled: {cancellation_details.reason}")
+                    if cancellation_details.reason == speechsdk.CancellationReason.Error:
+                        logger.error(f"Azure V2 error details: {cancellation_details.error_details}")
+                    else:
+                        reusable = True
+                    # Retry if possible
+                else:
+                    logger.error(f"Azure V2 synthesis failed with unexpected reason: {result.reason}")
+            finally:
+                if reusable:
+                    _release_v2_synthesizer(voice_name_base, speech_synthesizer, expires_at)
                 
         except Exception as e:
             logger.error(f"Azure TTS V2 failed on try {i+1}: {e}")
-            # Optional delay
-            # asyncio.run(asyncio.sleep(1))
             
-    logger.error(f"Azure TTS V2 failed after multiple retries for: {voice_file}")
     return None
 
 def _format_text(text: str) -> str:
     # ... (existing code)
-    text = re.sub(r'[\(\)\[\]\{\}]', ' ', text) # Remove brackets
-    text = ' '.join(text.split()) # Normalize whitespace
-    return text.strip()
+    # Remove brackets (C-level lookup table) and normalize whitespace
+    return ' '.join(text.translate(_BRACKET_TRANS).split())
+
 
+_soa_cache: "weakref.WeakKeyDictionary[SubMaker, tuple]" = weakref.WeakKeyDictionary()
 
-def create_subtitle(sub_maker: submaker.SubMaker, text: str, subtitle_file: Path):
+def _submaker_to_soa(sub_maker: SubMaker) -> Tuple[np.ndarray, List[str]]:
+    """
+    SubMaker data as (offsets int64 array (N, 2) in 100ns ticks, unescaped stripped words),
+    truncated to the shorter of subs/offset. Computed once per SubMaker and reused by
+    create_subtitle and get_timed_words_from_submaker; recomputed if words were added since.
+    """
+    n = min(len(sub_maker.subs), len(sub_maker.offset))
+    cached = _soa_cache.get(sub_maker)
+    if cached is not None and cached[0] == n:
+        return cached[1], cached[2]
+    offsets = np.asarray(sub_maker.offset[:n], dtype=np.int64).reshape(-1, 2)
+    words = [unescape(sub).strip() for sub in sub_maker.subs[:n]]
+    _soa_cache[sub_maker] = (n, offsets, words)
+    return offsets, words
+
+def _ticks_to_srt(ticks: float) -> str:
+    """Formats a time in 100ns ticks as an SRT timestamp HH:MM:SS,mmm."""
+    s, ms = divmod(max(int(ticks), 0) // 10_000, 1000)
+    m, s = divmod(s, 60)
+    h, m = divmod(m, 60)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+def create_subtitle(sub_maker: submaker.SubMaker, text: str, subtitle_file: Path, validate: bool = False):
     """
     Generates an SRT subtitle file from SubMaker data, aligning with text segments.
     Expects subtitle_file as a Path object.
+    Blocks are checked in memory; validate=True additionally re-parses the written file with moviepy.
     """
     if not sub_maker or not sub_maker.offset or not sub_maker.subs:
         logger.error("Cannot create subtitle: SubMaker data is invalid or empty.")
@@ -275,11 +514,9 @@ def create_subtitle(sub_maker: submaker.SubMaker, text: str, subtitle_file: Path
     text = _format_text(text)
 
     def formatter(idx: int, start_time: float, end_time: float, sub_text: str) -> str:
-        # Convert 100ns ticks to seconds for mktimestamp
-        start_sec = start_time / 10_000_000.0
-        end_sec = end_time / 10_000_000.0
-        start_t = mktimestamp(start_sec).replace(".", ",")
-        end_t = mktimestamp(end_sec).replace(".", ",")
+        # Times stay in integer 100ns ticks: no float seconds round-trip
+        start_t = _ticks_to_srt(start_time)
+        end_t = _ticks_to_srt(end_time)
         # Max 2 lines per subtitle block seems reasonable for TikTok
         words = sub_text.split()
         lines = []
@@ -298,13 +535,15 @@ def create_subtitle(sub_maker: submaker.SubMaker, text: str, subtitle_file: Path
     start_time_ns = -1.0
     sub_items = []
     sub_index = 0
-    current_sub_line = ""
 
     # Split target script text into manageable lines/phrases
     script_lines = split_string_by_punctuations(text)
     if not script_lines:
          logger.error("Cannot create subtitle: Could not split target text into lines.")
          return
+    # Computed once per line rather than once per word
+    script_lines = [line.strip() for line in script_lines]
+    script_ends_with_punct = [line[-1:] in _PUNCT_SET for line in script_lines]
 
     # --- Alignment Logic --- 
     # This part is complex. A simpler approach for now:
@@ -313,11 +552,16 @@ def create_subtitle(sub_maker: submaker.SubMaker, text: str, subtitle_file: Path
 
     word_idx = 0
     script_line_idx = 0
-    processed_words = 0
+    processed_words = 0 # Words of the block being built (the text itself comes from script_lines)
+    # Loop-invariant lookups bound to locals once; offsets bulk-decoded from the int64 array
+    offsets, subs_local = _submaker_to_soa(sub_maker)
+    offset_local = offsets.tolist()
+    n_words = len(subs_local)
+    n_script_lines = len(script_lines)
     
-    while word_idx < len(sub_maker.subs) and script_line_idx < len(script_lines):
-        start_ns, end_ns = sub_maker.offset[word_idx]
-        word = unescape(sub_maker.subs[word_idx]).strip()
+    while word_idx < n_words and script_line_idx < n_script_lines:
+        start_ns, end_ns = offset_local[word_idx]
+        word = subs_local[word_idx]
         
         if not word: # Skip empty words if any
              word_idx += 1
@@ -326,25 +570,24 @@ def create_subtitle(sub_maker: submaker.SubMaker, text: str, subtitle_file: Path
         if start_time_ns < 0:
             start_time_ns = start_ns
 
-        current_sub_line += f" {word}"
         processed_words += 1
         
         # Check if current word ends with punctuation similar to script line end
         # Or if we have accumulated a reasonable number of words for the line
-        ends_with_punctuation = any(word.endswith(p) for p in ",.!?。，、？！；：")
-        current_script_line = script_lines[script_line_idx].strip()
+        ends_with_punctuation = word[-1:] in _PUNCT_SET
+        current_script_line = script_lines[script_line_idx]
         
         # Condition to finalize a subtitle block
         # 1. Match punctuation at end? (approximate) 
         # 2. Accumulated enough words? (e.g., > 7 words) 
         # 3. Reached end of SubMaker words? 
         finalize_block = False
-        if ends_with_punctuation and any(current_script_line.endswith(p) for p in ",.!?。，、？！；：") :
+        if ends_with_punctuation and script_ends_with_punct[script_line_idx]:
              # Simple punctuation check - might need improvement
              finalize_block = True 
         elif processed_words >= 8: # Arbitrary word limit per block
              finalize_block = True
-        elif word_idx == len(sub_maker.subs) - 1: # Last word
+        elif word_idx == n_words - 1: # Last word
              finalize_block = True
              
         if finalize_block:
@@ -361,20 +604,19 @@ def create_subtitle(sub_maker: submaker.SubMaker, text: str, subtitle_file: Path
             
             # Reset for next block
             start_time_ns = -1.0
-            current_sub_line = ""
             script_line_idx += 1
             processed_words = 0
             
         word_idx += 1
         
     # Handle any remaining words or script lines if alignment wasn't perfect
-    if current_sub_line.strip() and script_line_idx < len(script_lines):
+    if processed_words and script_line_idx < len(script_lines):
          sub_index += 1
          line = formatter(
                 idx=sub_index,
                 start_time=start_time_ns,
-                end_time=sub_maker.offset[-1][1], # Use last word's end time
-                sub_text=script_lines[script_line_idx].strip(),
+                end_time=offset_local[-1][1], # Use last word's end time
+                sub_text=script_lines[script_line_idx],
             )
          sub_items.append(line)
          logger.warning("Appending remaining script line due to imperfect alignment.")
@@ -382,19 +624,34 @@ def create_subtitle(sub_maker: submaker.SubMaker, text: str, subtitle_file: Path
     if not sub_items:
          logger.error("Failed to generate any subtitle items.")
          return
+    malformed = [item for item in sub_items if not _SRT_BLOCK_RE.fullmatch(item)]
+    if malformed:
+         logger.error(f"Generated {len(malformed)} malformed subtitle block(s), first: {malformed[0]!r}")
+         return
          
     # Write the final SRT file
     try:
-        with open(subtitle_file_str, "w", encoding="utf-8") as file:
-            file.write("\n".join(sub_items) + "\n")
+        # Blocks streamed through the buffered writer (blank line after each), no joined copy in memory.
+        # Written to a temporary file then renamed: readers never see a partial SRT.
+        tmp_file_str = subtitle_file_str + ".tmp"
+        with open(tmp_file_str, "wb") as file:
+            file.writelines(f"{item}\n".encode("utf-8") for item in sub_items)
+            written_bytes = file.tell()
             
-        # Verify the created file
-        if not subtitle_file.exists() or subtitle_file.stat().st_size == 0:
+        # Verify the created file (byte count from the writer, no extra stat)
+        if written_bytes == 0:
+             os.remove(tmp_file_str)
              logger.error(f"Failed to write or created empty subtitle file: {subtitle_file_str}")
              return
+        os.replace(tmp_file_str, subtitle_file_str)
              
-        # Optional: Use moviepy to validate SRT format
+        if not validate:
+            logger.info(f"Subtitle file created: {subtitle_file_str}, Lines: {len(sub_items)}")
+            return
+
+        # Optional: Use moviepy to validate SRT format (slow import + full re-parse)
         try:
+            from moviepy.video.tools import subtitles as moviepy_subtitles # Alias to avoid conflict
             sbs = moviepy_subtitles.file_to_subtitles(subtitle_file_str, encoding="utf-8")
             if sbs:
                 duration = max([tb for ((ta, tb), txt) in sbs])
@@ -430,26 +687,21 @@ def get_timed_words_from_submaker(sub_maker: SubMaker) -> List[Dict[str, Union[f
         logger.warning("SubMaker subs and offset lengths do not match. Timed words may be inaccurate.")
         # Proceeding with the shorter length to avoid IndexError
     
-    min_len = min(len(sub_maker.subs), len(sub_maker.offset))
-
-    for i in range(min_len):
-        text = unescape(sub_maker.subs[i]).strip()
-        start_ns, end_ns = sub_maker.offset[i] # These are (start_time_100ns, end_time_100ns)
-
-        # Convert 100ns ticks to seconds
-        start_sec = start_ns / 10_000_000.0
-        end_sec = end_ns / 10_000_000.0
-        
-        # Ensure end_sec is not before start_sec (can happen with very short words or edge cases)
-        if end_sec < start_sec:
-            logger.warning(f"Word '{text}' has end time before start time. Adjusting end_sec = start_sec.")
-            end_sec = start_sec
-
-        timed_words_list.append({
-            "start": round(start_sec, 3),
-            "end": round(end_sec, 3),
-            "text": text
-        })
+    # (start_time_100ns, end_time_100ns) pairs converted to seconds in one vectorized pass
+    offsets, texts = _submaker_to_soa(sub_maker)
+    starts = offsets[:, 0] / 10_000_000.0
+    ends = offsets[:, 1] / 10_000_000.0
+
+    # Ensure end is not before start (can happen with very short words or edge cases)
+    inverted = ends < starts
+    if inverted.any():
+        logger.warning(f"{int(inverted.sum())} word(s) have end time before start time. Adjusting end = start.")
+        ends = np.maximum(ends, starts)
+
+    timed_words_list = [
+        {"start": start, "end": end, "text": text}
+        for start, end, text in zip(np.round(starts, 3).tolist(), np.round(ends, 3).tolist(), texts)
+    ]
     return timed_words_list
 
 if __name__ == "__main__":